@@ -4,14 +4,26 @@ from mediapipe.tasks.python import vision
 import cv2
 import asyncio
 import os
-import base64
+import time
 import numpy as np
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
 
 class FaceAuthenticator:
     # MediaPipe Face Landmarker model URL
     MODEL_URL = "https://storage.googleapis.com/mediapipe-models/face_landmarker/face_landmarker/float16/1/face_landmarker.task"
     MODEL_PATH = os.path.join(os.path.dirname(__file__), "face_landmarker.task")
+
+    # Motion gating for the auth loop
+    MOTION_SIZE = (160, 120)    # (w, h) of the grayscale frame used for frame differencing
+    MOTION_THRESHOLD = 2.0      # Mean absolute pixel difference that counts as movement
+    FORCE_CHECK_EVERY = 6       # Run detection at least this often even when the scene is static
+    LOOP_FPS = 6                # Auth loop rate cap; plenty to authenticate a user in front of the camera
     
     def __init__(self, reference_image_path="reference.jpg", on_status_change=None, on_frame=None):
         """
@@ -26,6 +38,7 @@ class FaceAuthenticator:
         self.authenticated = False
         self.running = False
         self.reference_landmarks = None
+        self._reference_norm = None # Cached L2 norm of reference_landmarks
         self.landmarker = None
 
         self._ensure_model()
@@ -91,8 +104,11 @@ class FaceAuthenticator:
         if landmarks1 is None or landmarks2 is None:
             return False
         
-        # Normalize vectors
-        norm1 = np.linalg.norm(landmarks1)
+        # Normalize vectors (the reference norm is computed once in _set_reference)
+        if landmarks1 is self.reference_landmarks and self._reference_norm is not None:
+            norm1 = self._reference_norm
+        else:
+            norm1 = np.linalg.norm(landmarks1)
         norm2 = np.linalg.norm(landmarks2)
         
         if norm1 == 0 or norm2 == 0:
@@ -107,11 +123,37 @@ class FaceAuthenticator:
             print(f"[AUTH] Face match! Similarity: {similarity:.4f}")
         return is_match
 
+    def _reference_cache_path(self):
+        """Landmark cache stored next to the reference image (e.g. reference.landmarks.npz)."""
+        return os.path.splitext(self.reference_image_path)[0] + ".landmarks.npz"
+
+    def _reference_cache_key(self):
+        """Cache key derived from the reference image's mtime and size."""
+        return f"{os.path.getmtime(self.reference_image_path)}_{os.path.getsize(self.reference_image_path)}"
+
+    def _set_reference(self, landmarks):
+        self.reference_landmarks = np.ascontiguousarray(landmarks, dtype=np.float32)
+        self._reference_norm = float(np.linalg.norm(self.reference_landmarks))
+
     def _load_reference(self):
         if not os.path.exists(self.reference_image_path):
             print(f"[AUTH] [WARN] Reference file not found at {self.reference_image_path}. Authentication will fail.")
             return
 
+        cache_path = self._reference_cache_path()
+        cache_key = self._reference_cache_key()
+
+        # Reuse the landmarks extracted on a previous run if the image hasn't changed
+        if os.path.exists(cache_path):
+            try:
+                with np.load(cache_path) as cached:
+                    if str(cached["key"]) == cache_key:
+                        self._set_reference(cached["landmarks"])
+                        print("[AUTH] [OK] Reference face landmarks loaded from cache.")
+                        return
+            except Exception as e:
+                print(f"[AUTH] [WARN] Ignoring unreadable landmark cache: {e}")
+
         try:
             print("[AUTH] Loading reference image...")
             img_bgr = cv2.imread(self.reference_image_path)
@@ -122,10 +164,15 @@ class FaceAuthenticator:
             # Convert to RGB
             image_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
             
-            self.reference_landmarks = self._extract_landmarks(image_rgb)
+            landmarks = self._extract_landmarks(image_rgb)
             
-            if self.reference_landmarks is not None:
+            if landmarks is not None:
+                self._set_reference(landmarks)
                 print("[AUTH] [OK] Reference face landmarks extracted successfully.")
+                try:
+                    np.savez(cache_path, landmarks=self.reference_landmarks, key=np.array(cache_key))
+                except Exception as e:
+                    print(f"[AUTH] [WARN] Could not write landmark cache: {e}")
             else:
                 print("[AUTH] [ERR] No face found in reference image.")
         except Exception as e:
@@ -165,6 +212,9 @@ class FaceAuthenticator:
                 print(f"[AUTH] [ERR] Could not open video device {index}.")
                 return None
             
+            # The loop runs at LOOP_FPS; don't let the driver queue up stale frames
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            
             ret, frame = cap.read()
             if not ret:
                  print(f"[AUTH] [ERR] Opened device {index} but failed to read first frame.")
@@ -185,20 +235,52 @@ class FaceAuthenticator:
              self.running = False
              return
 
-        process_this_frame = True
+        # Scratch buffers reused every frame (half-size working frame + tiny grayscale pair for motion)
+        small_buf = None
+        motion_bgr = np.empty((self.MOTION_SIZE[1], self.MOTION_SIZE[0], 3), dtype=np.uint8)
+        gray = np.empty((self.MOTION_SIZE[1], self.MOTION_SIZE[0]), dtype=np.uint8)
+        prev_gray = np.empty_like(gray)
+        has_prev = False
+        frames_since_check = self.FORCE_CHECK_EVERY
+        last_frame_future = None
+        # Single detection worker; at most one landmark detection is in flight at a time
+        detector = ThreadPoolExecutor(max_workers=1, thread_name_prefix="auth-detect")
+        pending_detection = None
+        frame_interval = 1.0 / self.LOOP_FPS
+        next_t = time.monotonic()
         
         while self.running and not self.authenticated:
+            # Pace the loop on a monotonic clock (time.sleep releases the GIL)
+            next_t += frame_interval
+            delay = next_t - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_t = time.monotonic()
+
             ret, frame = video_capture.read()
             if not ret:
                 print("[AUTH] [ERR] Failed to read frame from camera loop.")
                 break
             
-            # Convert BGR to RGB
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Process every other frame for performance
-            if process_this_frame:
-                current_landmarks = self._extract_landmarks(rgb_frame)
+            # Downsample once; used for detection, motion gating and the preview stream
+            h, w = frame.shape[:2]
+            if small_buf is None or small_buf.shape[:2] != (h // 2, w // 2):
+                small_buf = np.empty((h // 2, w // 2, 3), dtype=np.uint8)
+            small_frame = cv2.resize(frame, (w // 2, h // 2), dst=small_buf, interpolation=cv2.INTER_AREA)
+
+            # Motion gate: skip landmark detection on static frames, but re-check periodically
+            cv2.resize(small_frame, self.MOTION_SIZE, dst=motion_bgr, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(motion_bgr, cv2.COLOR_BGR2GRAY, dst=gray)
+            motion = cv2.absdiff(gray, prev_gray).mean() if has_prev else float("inf")
+            gray, prev_gray = prev_gray, gray
+            has_prev = True
+            frames_since_check += 1
+
+            # Collect a finished detection from the worker
+            if pending_detection is not None and pending_detection.done():
+                current_landmarks = pending_detection.result()
+                pending_detection = None
                 
                 if self._compare_landmarks(self.reference_landmarks, current_landmarks):
                     self.authenticated = True
@@ -208,14 +290,20 @@ class FaceAuthenticator:
                     self.running = False
                     break
 
-            process_this_frame = not process_this_frame
+            # Hand the next frame to the worker so detection overlaps capture/preview encoding
+            if pending_detection is None and (motion >= self.MOTION_THRESHOLD or frames_since_check >= self.FORCE_CHECK_EVERY):
+                frames_since_check = 0
+                # Landmarks are normalized, so the half-size frame compares fine against the reference
+                rgb_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+                pending_detection = detector.submit(self._extract_landmarks, rgb_frame)
 
-            # Send frame to frontend if callback exists
-            if self.on_frame:
-                small_frame = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
+            # Send frame to frontend if callback exists.
+            # Single-slot backpressure: skip encoding while the previous frame is still in flight.
+            if self.on_frame and (last_frame_future is None or last_frame_future.done()):
                 _, buffer = cv2.imencode('.jpg', small_frame)
                 b64_str = base64.b64encode(buffer).decode('utf-8')
                 
-                asyncio.run_coroutine_threadsafe(self.on_frame(b64_str), loop)
+                last_frame_future = asyncio.run_coroutine_threadsafe(self.on_frame(b64_str), loop)
 
+        detector.shutdown(wait=True)
         video_capture.release()
@@ -1,6 +1,10 @@
 import os
+import re
+import sys
 import json
 import asyncio
+import subprocess
+from collections import OrderedDict
 from datetime import datetime
 from google import genai
 from google.genai import types
@@ -10,6 +14,71 @@ from typing import List, Optional
 
 load_dotenv()
 
+_PY_BLOCK = re.compile(r'```python(.*?)```', re.DOTALL)
+# Absolute Windows output paths baked into a saved script (escaped or not, and forward-slash variants)
+_WIN_OUTPUT_PATH = re.compile(r"['\"]C:\\\\?Users\\\\?[^'\"]+\\\\?output[^'\"]*\.stl['\"]")
+_WIN_OUTPUT_PATH_FWD = re.compile(r"['\"]C:/Users/[^'\"]+/output[^'\"]*\.stl['\"]")
+
+CODE_CACHE_SIZE = 32  # known-good scripts kept per prompt
+SCRIPT_TIMEOUT = 120  # seconds a generated script may run before we give up on it
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cad_worker.py")
+
+class CadWorker:
+    """
+    One warm cad_worker.py process that runs scripts one at a time.
+    Started on first use, killed on timeout and restarted after a crash.
+    """
+    def __init__(self):
+        self._proc = None
+        self._lock = asyncio.Lock()
+
+    def start(self):
+        """Launches the worker if it isn't running; cheap to call when it already is."""
+        if self._proc is None or self._proc.poll() is not None:
+            self._proc = subprocess.Popen(
+                [sys.executable, WORKER_SCRIPT],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                encoding="utf-8"
+            )
+        return self._proc
+
+    def kill(self):
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.wait()
+            self._proc = None
+
+    @staticmethod
+    def _exchange(proc, request):
+        proc.stdin.write(request)
+        proc.stdin.flush()
+        return proc.stdout.readline()
+
+    async def run(self, script_path, output_path, timeout):
+        """Runs one script in the worker. Returns (error, stl_b64) as cad_worker.run_script."""
+        async with self._lock:
+            proc = self.start()
+            request = json.dumps({"script": script_path, "output": output_path}) + "\n"
+            try:
+                line = await asyncio.wait_for(asyncio.to_thread(self._exchange, proc, request), timeout=timeout)
+            except asyncio.TimeoutError:
+                # Killing the process also unblocks the reader thread (readline hits EOF)
+                self.kill()
+                return f"Script did not finish within {timeout} seconds.", None
+            except OSError as e:
+                self.kill()
+                return f"CAD worker crashed: {e}", None
+            if not line:
+                # A hard crash inside OCP kills the worker; start a fresh one next time
+                self.kill()
+                return "CAD worker crashed while running the script.", None
+            reply = json.loads(line)
+            return reply["error"], reply["stl"]
+
+_worker = CadWorker()
+
 class CadAgent:
     def __init__(self, on_thought=None, on_status=None):
         self.client = genai.Client(http_options={"api_version": "v1beta"}, api_key=os.getenv("GEMINI_API_KEY"))
@@ -17,6 +86,7 @@ class CadAgent:
         self.model = "gemini-3-pro-preview"
         self.on_thought = on_thought  # Callback for streaming thoughts 
         self.on_status = on_status  # Callback for retry status info
+        self._code_cache = OrderedDict()  # prompt -> script that produced an STL (LRU)
         
         self.system_instruction = """
 You are a Python-based 3D CAD Engineer using the `build123d` library.
@@ -59,6 +129,58 @@ result_part = p.part
 export_stl(result_part, 'output.stl')
 ```
 """
+        # Shared by every generate/iterate attempt instead of being rebuilt per call
+        self.generation_config = types.GenerateContentConfig(
+            system_instruction=self.system_instruction,
+            temperature=1.0,
+            thinking_config=types.ThinkingConfig(include_thoughts=True)
+        )
+
+    async def _run_script(self, script_path, output_path):
+        """Runs a generated script in the warm worker process. Returns (error, stl_b64)."""
+        return await _worker.run(script_path, output_path, SCRIPT_TIMEOUT)
+
+    async def _request_code(self, contents):
+        """Streams a script from Gemini (forwarding thoughts) and extracts the python block. Returns None on failure."""
+        raw_content = ""
+        stream = await self.client.aio.models.generate_content_stream(
+            model=self.model,
+            contents=contents,
+            config=self.generation_config
+        )
+        async for chunk in stream:
+            if chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts:
+                for part in chunk.candidates[0].content.parts:
+                    if not part.text:
+                        continue
+                    elif part.thought:
+                        # Stream thought to callback
+                        if self.on_thought:
+                            self.on_thought(part.text)
+                    else:
+                        # Accumulate answer text
+                        raw_content += part.text
+        
+        if not raw_content:
+            print("[CadAgent DEBUG] [ERR] Empty response from model.")
+            return None
+
+        # 2. Extract Code Block
+        code_match = _PY_BLOCK.search(raw_content)
+        if code_match:
+            return code_match.group(1).strip()
+        # Fallback: assume entire text is code if no blocks, or fail
+        print("[CadAgent DEBUG] [WARN] No ```python block found. Trying heuristic...")
+        if "import build123d" in raw_content:
+            return raw_content
+        print("[CadAgent DEBUG] [ERR] Could not extract python code.")
+        return None
+
+    def _cache_code(self, prompt, code):
+        self._code_cache[prompt] = code
+        self._code_cache.move_to_end(prompt)
+        while len(self._code_cache) > CODE_CACHE_SIZE:
+            self._code_cache.popitem(last=False)
 
     async def generate_prototype(self, prompt: str, output_dir: Optional[str] = None):
         """
@@ -68,6 +190,8 @@ export_stl(result_part, 'output.stl')
             output_dir: Directory to save the script and STL. If None, uses temp dir.
         """
         print(f"[CadAgent DEBUG] [START] Generation started for: '{prompt}'")
+        # Boot the worker (and its build123d import) while Gemini writes the script
+        _worker.start()
         
         try:
             # Use provided output_dir or fall back to temp
@@ -99,46 +223,14 @@ export_stl(result_part, 'output.stl')
                     }
                     self.on_status(status_info)
                 
-                # 1. Ask Gemini for the code with streaming and thinking
-                raw_content = ""
-                stream = await self.client.aio.models.generate_content_stream(
-                    model=self.model,
-                    contents=current_prompt,
-                    config=types.GenerateContentConfig(
-                        system_instruction=self.system_instruction,
-                        temperature=1.0,
-                        thinking_config=types.ThinkingConfig(include_thoughts=True)
-                    )
-                )
-                async for chunk in stream:
-                    if chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts:
-                        for part in chunk.candidates[0].content.parts:
-                            if not part.text:
-                                continue
-                            elif part.thought:
-                                # Stream thought to callback
-                                if self.on_thought:
-                                    self.on_thought(part.text)
-                            else:
-                                # Accumulate answer text
-                                raw_content += part.text
-                
-                if not raw_content:
-                    print("[CadAgent DEBUG] [ERR] Empty response from model.")
-                    return None
-
-                # 2. Extract Code Block
-                import re
-                code_match = re.search(r'```python(.*?)```', raw_content, re.DOTALL)
-                if code_match:
-                    code = code_match.group(1).strip()
+                # 1. Ask Gemini for the code (unless this exact request already produced a working script)
+                code = self._code_cache.get(prompt) if attempt == 0 else None
+                if code is not None:
+                    self._code_cache.move_to_end(prompt)
+                    print("[CadAgent DEBUG] [CACHE] Reusing script from an identical earlier request.")
                 else:
-                    # Fallback: assume entire text is code if no blocks, or fail
-                    print("[CadAgent DEBUG] [WARN] No ```python block found. Trying heuristic...")
-                    if "import build123d" in raw_content:
-                        code = raw_content
-                    else:
-                        print("[CadAgent DEBUG] [ERR] Could not extract python code.")
+                    code = await self._request_code(current_prompt)
+                    if code is None:
                         return None
                 
                 # 3. Save to Local File in cad_outputs folder
@@ -152,27 +244,9 @@ export_stl(result_part, 'output.stl')
                     
                 print(f"[CadAgent DEBUG] [EXEC] Running local script: {script_path}")
                 
-                # 4. Execute Locally
-                import subprocess
-                import sys
-                
-                # Use the current Python interpreter (unified environment with build123d + mediapipe)
-                try:
-                    proc = await asyncio.to_thread(
-                        subprocess.run,
-                        [sys.executable, script_path],
-                        capture_output=True,
-                        text=True
-                    )
-                    stdout, stderr = proc.stdout, proc.stderr
-                except Exception as e:
-                     print(f"[CadAgent DEBUG] [ERR] Subprocess run failed: {e}")
-                     proc = type('obj', (object,), {'returncode': 1})
-                     stdout = ""
-                     stderr = str(e)
-                
-                if proc.returncode != 0:
-                    error_msg = stderr
+                # 4. Execute Locally (in the pre-warmed worker process)
+                error_msg, b64_stl = await self._run_script(script_path, output_stl)
+                if error_msg is not None:
                     # Extract a concise error message for display
                     error_lines = error_msg.strip().split('\n')
                     short_error = error_lines[-1][:100] if error_lines else "Unknown error"
@@ -200,15 +274,10 @@ Original request: {prompt}
                 
                 print(f"[CadAgent DEBUG] [OK] Script executed successfully.")
                 
-                # 5. Read Output
-                if os.path.exists(output_stl):
+                # 5. Output (read and encoded by the worker)
+                if b64_stl is not None:
                     print(f"[CadAgent DEBUG] [file] '{output_stl}' found.")
-                    with open(output_stl, "rb") as f:
-                        stl_data = f.read()
-                        
-                    import base64
-                    b64_stl = base64.b64encode(stl_data).decode('utf-8')
-                    
+                    self._cache_code(prompt, code)
                     return {
                         "format": "stl",
                         "data": b64_stl,
@@ -246,6 +315,7 @@ Original request: {prompt}
             output_dir: Directory containing existing script and where to save new STL.
         """
         print(f"[CadAgent DEBUG] [START] Iteration started for: '{prompt}'")
+        _worker.start()
         
         # Use provided output_dir or fall back to temp
         if output_dir:
@@ -268,19 +338,10 @@ Original request: {prompt}
             
             # Sanitize existing code: replace any absolute paths with 'output.stl'
             # This prevents the LLM from seeing/reproducing Windows paths that cause Unicode escape errors
-            import re
             # Match both escaped (\\) and unescaped (\) Windows paths to output.stl
-            existing_code = re.sub(
-                r"['\"]C:\\\\?Users\\\\?[^'\"]+\\\\?output[^'\"]*\.stl['\"]",
-                "'output.stl'",
-                existing_code
-            )
+            existing_code = _WIN_OUTPUT_PATH.sub("'output.stl'", existing_code)
             # Also handle forward-slash variants
-            existing_code = re.sub(
-                r"['\"]C:/Users/[^'\"]+/output[^'\"]*\.stl['\"]",
-                "'output.stl'",
-                existing_code
-            )
+            existing_code = _WIN_OUTPUT_PATH_FWD.sub("'output.stl'", existing_code)
         else:
              print("[CadAgent DEBUG] [WARN] No existing script found. Falling back to fresh generation.")
              return await self.generate_prototype(prompt)
@@ -315,47 +376,10 @@ Ensure you still export to 'output.stl'.
                     }
                     self.on_status(status_info)
                 
-                # 1. Ask Gemini for the code with streaming and thinking
-                raw_content = ""
-                stream = await self.client.aio.models.generate_content_stream(
-                    model=self.model,
-                    contents=current_prompt,
-                    config=types.GenerateContentConfig(
-                        system_instruction=self.system_instruction,
-                        temperature=1.0,
-                        thinking_config=types.ThinkingConfig(include_thoughts=True)
-                    )
-                )
-                async for chunk in stream:
-                    if chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts:
-                        for part in chunk.candidates[0].content.parts:
-                            if not part.text:
-                                continue
-                            elif part.thought:
-                                # Stream thought to callback
-                                if self.on_thought:
-                                    self.on_thought(part.text)
-                            else:
-                                # Accumulate answer text
-                                raw_content += part.text
-                
-                if not raw_content:
-                    print("[CadAgent DEBUG] [ERR] Empty response from model.")
+                # 1. Ask Gemini for the code
+                code = await self._request_code(current_prompt)
+                if code is None:
                     return None
-
-                # 2. Extract Code Block
-                import re
-                code_match = re.search(r'```python(.*?)```', raw_content, re.DOTALL)
-                if code_match:
-                    code = code_match.group(1).strip()
-                else:
-                    # Fallback: assume entire text is code if no blocks, or fail
-                    print("[CadAgent DEBUG] [WARN] No ```python block found. Trying heuristic...")
-                    if "import build123d" in raw_content:
-                        code = raw_content
-                    else:
-                        print("[CadAgent DEBUG] [ERR] Could not extract python code.")
-                        return None
                 
                 # 3. Save to Local File in cad_outputs folder
                 # Overwrite the script so the next iteration builds on this one
@@ -370,28 +394,9 @@ Ensure you still export to 'output.stl'.
                     
                 print(f"[CadAgent DEBUG] [EXEC] Running local script: {script_path}")
                 
-                # 4. Execute Locally
-                import subprocess
-                import sys
-                
-                # Use asyncio.to_thread for Windows compatibility (asyncio.create_subprocess_exec
-                # throws NotImplementedError on Windows with certain event loop policies)
-                try:
-                    proc = await asyncio.to_thread(
-                        subprocess.run,
-                        [sys.executable, script_path],
-                        capture_output=True,
-                        text=True
-                    )
-                    stdout, stderr = proc.stdout, proc.stderr
-                except Exception as e:
-                    print(f"[CadAgent DEBUG] [ERR] Subprocess run failed: {e}")
-                    proc = type('obj', (object,), {'returncode': 1})()
-                    stdout = ""
-                    stderr = str(e)
-                
-                if proc.returncode != 0:
-                    error_msg = stderr
+                # 4. Execute Locally (in the pre-warmed worker process)
+                error_msg, b64_stl = await self._run_script(script_path, output_stl)
+                if error_msg is not None:
                     print(f"[CadAgent DEBUG] [ERR] Script Execution Failed:\n{error_msg}")
                     
                     # Preparing feedback for next attempt
@@ -406,15 +411,9 @@ Ensure you still export to 'output.stl'.
                 
                 print(f"[CadAgent DEBUG] [OK] Script executed successfully.")
                 
-                # 5. Read Output
-                if os.path.exists(output_stl):
+                # 5. Output (read and encoded by the worker)
+                if b64_stl is not None:
                     print(f"[CadAgent DEBUG] [file] '{output_stl}' found.")
-                    with open(output_stl, "rb") as f:
-                        stl_data = f.read()
-                        
-                    import base64
-                    b64_stl = base64.b64encode(stl_data).decode('utf-8')
-                    
                     return {
                         "format": "stl",
                         "data": b64_stl,
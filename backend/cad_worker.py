@@ -0,0 +1,55 @@
+"""
+Long-lived runner for generated CAD scripts, started by CadAgent as `python cad_worker.py`.
+
+Reads one JSON request per line on stdin ({"script": ..., "output": ...}), runs the
+script with build123d already imported, and answers with one JSON line
+({"error": ..., "stl": ...}) on the original stdout. Anything the script itself
+prints goes to stderr so it can't corrupt the replies.
+"""
+import os
+import sys
+import json
+import base64
+import traceback
+
+def run_script(script_path, output_path):
+    """
+    Executes a generated script.
+    Returns (error, stl_b64): the traceback if the script failed, otherwise the
+    exported STL already base64-encoded (None if the script didn't write it).
+    """
+    try:
+        with open(script_path, "r") as f:
+            code = f.read()
+        exec(compile(code, script_path, "exec"), {"__name__": "__main__", "__file__": script_path})
+    except BaseException:
+        # BaseException so a script calling sys.exit() can't take the worker down
+        return traceback.format_exc(), None
+    # Read and encode here so neither touches the server's event loop
+    try:
+        with open(output_path, "rb") as f:
+            return None, base64.b64encode(f.read()).decode('utf-8')
+    except FileNotFoundError:
+        return None, None
+
+def main():
+    # Keep the reply channel private and send everything else written to stdout to stderr
+    replies = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    # Imported once here so scripts don't each pay the multi-second build123d/OCP import
+    try:
+        import build123d  # noqa: F401
+    except ImportError:
+        pass
+
+    # Ends when the server closes our stdin (or dies)
+    for line in sys.stdin:
+        request = json.loads(line)
+        error, stl = run_script(request["script"], request["output"])
+        replies.write(json.dumps({"error": error, "stl": stl}) + "\n")
+        replies.flush()
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,18 @@
 import asyncio
-import base64
-import io
 import os
 import sys
 import traceback
 from dotenv import load_dotenv
 import cv2
 import pyaudio
-import PIL.Image
+import numpy as np
 import mss
 import argparse
+import itertools
 import math
-import struct
 import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
 from google import genai
 from google.genai import types
@@ -24,15 +24,27 @@ if sys.version_info < (3, 11, 0):
 
 from tools import tools_list
 
+# SIMD base64 encoder for per-frame payloads; falls back to the stdlib if not installed
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
 FORMAT = pyaudio.paInt16
 CHANNELS = 1
 SEND_SAMPLE_RATE = 16000
 RECEIVE_SAMPLE_RATE = 24000
 CHUNK_SIZE = 1024
+SEND_BATCH_MAX = 8 # Max queued realtime messages drained per send_realtime wakeup
+PLAYBACK_FLUSH_BYTES = 2 * RECEIVE_SAMPLE_RATE * 20 // 1000 # ~20 ms of 16-bit mono PCM
 
 MODEL = "models/gemini-2.5-flash-native-audio-preview-12-2025"
 DEFAULT_MODE = "camera"
 
+# Tool-confirmation request IDs; shared by every AudioLoop so a popup left over from
+# an earlier session can never carry the same ID as a request in the current one
+_confirmation_ids = itertools.count(1)
+
 load_dotenv()
 client = genai.Client(http_options={"api_version": "v1beta"}, api_key=os.getenv("GEMINI_API_KEY"))
 
@@ -207,13 +219,40 @@ config = types.LiveConnectConfig(
 
 pya = pyaudio.PyAudio()
 
+# Fixed tool acknowledgements / notifications (built once, reused per call)
+TOOL_DENIED_TEXT = "User denied the request to use this tool."
+CONFIRMATION_TIMEOUT = 120 # seconds before an unanswered tool confirmation counts as denied
+WEB_ACK_TEXT = "Web Navigation started. Do not reply to this message."
+WRITE_FILE_ACK_TEXT = "Writing file..."
+READ_DIRECTORY_ACK_TEXT = "Reading directory..."
+READ_FILE_ACK_TEXT = "Reading file..."
+CAD_COMPLETE_MSG = "System Notification: CAD generation is complete! The 3D model is now displayed for the user. Let them know it's ready."
+CAD_FAILED_MSG = "System Notification: CAD generation failed."
+
+def ack_response(fc, text):
+    """Builds the FunctionResponse for a tool call with a plain result string."""
+    return types.FunctionResponse(id=fc.id, name=fc.name, response={"result": text})
+
 from cad_agent import CadAgent
 from web_agent import WebAgent
 from kasa_agent import KasaAgent
 from printer_agent import PrinterAgent
+from project_manager import ProjectManager
+
+class ClearableQueue(asyncio.Queue):
+    """asyncio.Queue with an O(1) clear(), used to drop pending playback on interruption."""
+
+    def clear(self):
+        """Drops every queued item and returns how many were discarded."""
+        count = len(self._queue)
+        self._queue.clear()
+        self._unfinished_tasks = max(0, self._unfinished_tasks - count)
+        if self._unfinished_tasks == 0:
+            self._finished.set()
+        return count
 
 class AudioLoop:
-    def __init__(self, video_mode=DEFAULT_MODE, on_audio_data=None, on_video_frame=None, on_cad_data=None, on_web_data=None, on_transcription=None, on_tool_confirmation=None, on_cad_status=None, on_cad_thought=None, on_project_update=None, on_device_update=None, on_error=None, input_device_index=None, input_device_name=None, output_device_index=None, kasa_agent=None):
+    def __init__(self, video_mode=DEFAULT_MODE, on_audio_data=None, on_video_frame=None, on_cad_data=None, on_web_data=None, on_transcription=None, on_tool_confirmation=None, on_cad_status=None, on_cad_thought=None, on_project_update=None, on_device_update=None, on_error=None, input_device_index=None, input_device_name=None, output_device_index=None, kasa_agent=None, on_tool_confirmation_dismissed=None):
         self.video_mode = video_mode
         self.on_audio_data = on_audio_data
         self.on_video_frame = on_video_frame
@@ -221,6 +260,7 @@ class AudioLoop:
         self.on_web_data = on_web_data
         self.on_transcription = on_transcription
         self.on_tool_confirmation = on_tool_confirmation 
+        self.on_tool_confirmation_dismissed = on_tool_confirmation_dismissed
         self.on_cad_status = on_cad_status
         self.on_cad_thought = on_cad_thought
         self.on_project_update = on_project_update
@@ -234,6 +274,13 @@ class AudioLoop:
         self.out_queue = None
         self.paused = False
 
+        # Model audio is coalesced here before being queued for playback
+        self._pending_pcm = bytearray()
+
+        # Mic capture (filled by the PyAudio stream callback)
+        self._loop = None
+        self._mic_queue = None
+
         self.chat_buffer = {"sender": None, "text": ""} # For aggregating chunks
         
         # Track last transcription text to calculate deltas (Gemini sends cumulative text)
@@ -246,17 +293,9 @@ class AudioLoop:
 
         self.session = None
         
-        # Create CadAgent with thought callback
-        def handle_cad_thought(thought_text):
-            if self.on_cad_thought:
-                self.on_cad_thought(thought_text)
-        
-        def handle_cad_status(status_info):
-            if self.on_cad_status:
-                self.on_cad_status(status_info)
-        
-        self.cad_agent = CadAgent(on_thought=handle_cad_thought, on_status=handle_cad_status)
-        self.web_agent = WebAgent()
+        # CadAgent / WebAgent are created lazily on first use (see the properties below)
+        self._cad_agent = None
+        self._web_agent = None
         self.kasa_agent = kasa_agent if kasa_agent else KasaAgent()
         self.printer_agent = PrinterAgent()
 
@@ -270,12 +309,13 @@ class AudioLoop:
 
         # Video buffering state
         self._latest_image_payload = None
+        self._resize_buf = None # Reused cv2.resize destination for camera frames
+        self._last_screen_hash = None # Digest of the last screen grab we sent
         # VAD State
         self._is_speaking = False
         self._silence_start_time = None
         
         # Initialize ProjectManager
-        from project_manager import ProjectManager
         # Assuming we are running from backend/ or root? 
         # Using abspath of current file to find root
         current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -290,6 +330,26 @@ class AudioLoop:
             # We will handle this by calling it in run() or just print for now.
             pass
 
+    @property
+    def cad_agent(self):
+        if self._cad_agent is None:
+            self._cad_agent = CadAgent(on_thought=self._handle_cad_thought, on_status=self._handle_cad_status)
+        return self._cad_agent
+
+    @property
+    def web_agent(self):
+        if self._web_agent is None:
+            self._web_agent = WebAgent()
+        return self._web_agent
+
+    def _handle_cad_thought(self, thought_text):
+        if self.on_cad_thought:
+            self.on_cad_thought(thought_text)
+
+    def _handle_cad_status(self, status_info):
+        if self.on_cad_status:
+            self.on_cad_status(status_info)
+
     def flush_chat(self):
         """Forces the current chat buffer to be written to log."""
         if self.chat_buffer["sender"] and self.chat_buffer["text"].strip():
@@ -308,11 +368,26 @@ class AudioLoop:
 
     def stop(self):
         self.stop_event.set()
+        # Nobody is left to answer these; release anything still waiting on them
+        for request_id, future in self._pending_confirmations.items():
+            future.cancel()
+            self._dismiss_tool_confirmation(request_id)
+        self._pending_confirmations.clear()
+
+    def _dismiss_tool_confirmation(self, request_id):
+        # Take down a popup whose request can no longer be answered
+        if self.on_tool_confirmation_dismissed:
+            self.on_tool_confirmation_dismissed(request_id)
         
     def resolve_tool_confirmation(self, request_id, confirmed):
         print(f"[JARVIS DEBUG] [RESOLVE] resolve_tool_confirmation called. ID: {request_id}, Confirmed: {confirmed}")
-        if request_id in self._pending_confirmations:
-            future = self._pending_confirmations[request_id]
+        # IDs are ints; tolerate clients that echo them back as strings
+        try:
+            request_id = int(request_id)
+        except (TypeError, ValueError):
+            pass
+        future = self._pending_confirmations.get(request_id)
+        if future is not None:
             if not future.done():
                 print(f"[JARVIS DEBUG] [RESOLVE] Future found and pending. Setting result to: {confirmed}")
                 future.set_result(confirmed)
@@ -324,30 +399,77 @@ class AudioLoop:
     def clear_audio_queue(self):
         """Clears the queue of pending audio chunks to stop playback immediately."""
         try:
-            count = 0
-            while not self.audio_in_queue.empty():
-                self.audio_in_queue.get_nowait()
-                count += 1
+            self._pending_pcm.clear()
+            count = self.audio_in_queue.clear()
             if count > 0:
                 print(f"[JARVIS DEBUG] [AUDIO] Cleared {count} chunks from playback queue due to interruption.")
         except Exception as e:
             print(f"[JARVIS DEBUG] [ERR] Failed to clear audio queue: {e}")
 
-    async def send_frame(self, frame_data):
-        # Update the latest frame payload
-        if isinstance(frame_data, bytes):
-            b64_data = base64.b64encode(frame_data).decode('utf-8')
-        else:
-            b64_data = frame_data 
+    def _flush_pending_pcm(self):
+        """Queues the coalesced model audio for playback as one chunk."""
+        if self._pending_pcm:
+            self.audio_in_queue.put_nowait(bytes(self._pending_pcm))
+            self._pending_pcm.clear()
 
+    async def send_frame(self, frame_data):
+        # Raw JPEG bytes go through untouched (session.send encodes them on the wire, like
+        # the PCM chunks), so frames superseded before the next send are never encoded.
+        # Legacy base64 strings are still accepted as-is.
         # Store as the designated "next frame to send"
-        self._latest_image_payload = {"mime_type": "image/jpeg", "data": b64_data}
+        self._latest_image_payload = {"mime_type": "image/jpeg", "data": frame_data}
         # No event signal needed - listen_audio pulls it
 
     async def send_realtime(self):
         while True:
-            msg = await self.out_queue.get()
-            await self.session.send(input=msg, end_of_turn=False)
+            batch = [await self.out_queue.get()]
+            # Opportunistically drain whatever queued up meanwhile (no extra wait)
+            while len(batch) < SEND_BATCH_MAX:
+                try:
+                    batch.append(self.out_queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            for msg in self._coalesce_pcm(batch):
+                await self.session.send(input=msg, end_of_turn=False)
+
+    @staticmethod
+    def _coalesce_pcm(batch):
+        """Merges runs of adjacent PCM chunks into one message; other payloads keep their order.
+
+        A lone PCM chunk is passed through as-is, so the PortAudio buffer reaches
+        session.send without being copied.
+        """
+        merged = []
+        pcm = []
+
+        def flush():
+            if len(pcm) == 1:
+                merged.append(pcm[0])
+            else:
+                merged.append({"data": b"".join(m["data"] for m in pcm), "mime_type": "audio/pcm"})
+            pcm.clear()
+
+        for msg in batch:
+            if msg.get("mime_type") == "audio/pcm":
+                pcm.append(msg)
+                continue
+            if pcm:
+                flush()
+            merged.append(msg)
+        if pcm:
+            flush()
+        return merged
+
+    def _pa_input_cb(self, in_data, frame_count, time_info, status):
+        """PyAudio input callback. Runs on PortAudio's thread, so it only schedules work on the loop."""
+        if self.paused:
+            return (None, pyaudio.paContinue)
+        try:
+            self._loop.call_soon_threadsafe(self._mic_queue.put_nowait, in_data)
+        except RuntimeError:
+            # Event loop already closed (shutdown/reconnect) - stop the stream
+            return (None, pyaudio.paComplete)
+        return (None, pyaudio.paContinue)
 
     async def listen_audio(self):
         mic_info = pya.get_default_input_device_info()
@@ -392,6 +514,10 @@ class AudioLoop:
         if resolved_input_device_index is None:
              print("[JARVIS] Using Default Input Device")
 
+        # PortAudio pushes chunks from its own thread; the callback hands them to this queue
+        self._loop = asyncio.get_running_loop()
+        self._mic_queue = asyncio.Queue()
+
         try:
             self.audio_stream = await asyncio.to_thread(
                 pya.open,
@@ -401,41 +527,32 @@ class AudioLoop:
                 input=True,
                 input_device_index=resolved_input_device_index if resolved_input_device_index is not None else mic_info["index"],
                 frames_per_buffer=CHUNK_SIZE,
+                stream_callback=self._pa_input_cb,
             )
         except OSError as e:
             print(f"[JARVIS] [ERR] Failed to open audio input stream: {e}")
             print("[JARVIS] [WARN] Audio features will be disabled. Please check microphone permissions.")
             return
 
-        if __debug__:
-            kwargs = {"exception_on_overflow": False}
-        else:
-            kwargs = {}
-        
         # VAD Constants
         VAD_THRESHOLD = 800 # Adj based on mic sensitivity (800 is conservative for 16-bit)
         SILENCE_DURATION = 0.5 # Seconds of silence to consider "done speaking"
         
         while True:
-            if self.paused:
-                await asyncio.sleep(0.1)
-                continue
+            data = await self._mic_queue.get()
 
             try:
-                data = await asyncio.to_thread(self.audio_stream.read, CHUNK_SIZE, **kwargs)
-                
                 # 1. Send Audio
                 if self.out_queue:
                     await self.out_queue.put({"data": data, "mime_type": "audio/pcm"})
                 
                 # 2. VAD Logic for Video
                 # rms = audioop.rms(data, 2)
-                # Replacement for audioop.rms(data, 2)
+                # Replacement for audioop.rms(data, 2), computed on a zero-copy int16 view
                 count = len(data) // 2
                 if count > 0:
-                    shorts = struct.unpack(f"<{count}h", data)
-                    sum_squares = sum(s**2 for s in shorts)
-                    rms = int(math.sqrt(sum_squares / count))
+                    samples = np.frombuffer(data, dtype="<i2", count=count).astype(np.float32)
+                    rms = int(math.sqrt(float(np.dot(samples, samples)) / count))
                 else:
                     rms = 0
                 
@@ -467,8 +584,7 @@ class AudioLoop:
                             self._silence_start_time = None
 
             except Exception as e:
-                print(f"Error reading audio: {e}")
-                await asyncio.sleep(0.1)
+                print(f"Error processing audio: {e}")
 
     async def handle_cad_request(self, prompt):
         print(f"[JARVIS DEBUG] [CAD] Background Task Started: handle_cad_request('{prompt}')")
@@ -516,9 +632,8 @@ class AudioLoop:
                  self.project_manager.save_cad_artifact("output.stl", prompt)
 
             # Notify the model that the task is done - this triggers speech about completion
-            completion_msg = "System Notification: CAD generation is complete! The 3D model is now displayed for the user. Let them know it's ready."
             try:
-                await self.session.send(input=completion_msg, end_of_turn=True)
+                await self.session.send(input=CAD_COMPLETE_MSG, end_of_turn=True)
                 print(f"[JARVIS DEBUG] [NOTE] Sent completion notification to model.")
             except Exception as e:
                  print(f"[JARVIS DEBUG] [ERR] Failed to send completion notification: {e}")
@@ -527,7 +642,7 @@ class AudioLoop:
             print(f"[JARVIS DEBUG] [ERR] CadAgent returned None.")
             # Optionally notify failure
             try:
-                await self.session.send(input="System Notification: CAD generation failed.", end_of_turn=True)
+                await self.session.send(input=CAD_FAILED_MSG, end_of_turn=True)
             except Exception:
                 pass
 
@@ -647,13 +762,19 @@ class AudioLoop:
                 async for response in turn:
                     # 1. Handle Audio Data
                     if data := response.data:
-                        self.audio_in_queue.put_nowait(data)
+                        # Coalesce small packets; playback gets one chunk per ~20 ms of audio
+                        self._pending_pcm += data
+                        if len(self._pending_pcm) >= PLAYBACK_FLUSH_BYTES:
+                            self._flush_pending_pcm()
                         # NOTE: 'continue' removed here to allow processing transcription/tools in same packet
 
                     # 2. Handle Transcription (User & Model)
-                    if response.server_content:
-                        if response.server_content.input_transcription:
-                            transcript = response.server_content.input_transcription.text
+                    # Bind each field once; audio-only packets skip the rest with two cheap checks
+                    sc = response.server_content
+                    if sc:
+                        input_tx = sc.input_transcription
+                        if input_tx:
+                            transcript = input_tx.text
                             if transcript:
                                 # Skip if this is an exact duplicate event
                                 if transcript != self._last_input_transcription:
@@ -683,8 +804,9 @@ class AudioLoop:
                                             # Append
                                             self.chat_buffer["text"] += delta
                         
-                        if response.server_content.output_transcription:
-                            transcript = response.server_content.output_transcription.text
+                        output_tx = sc.output_transcription
+                        if output_tx:
+                            transcript = output_tx.text
                             if transcript:
                                 # Skip if this is an exact duplicate event
                                 if transcript != self._last_output_transcription:
@@ -716,10 +838,13 @@ class AudioLoop:
                         # We can also check turn_complete signal if available in response.server_content.model_turn etc
 
                     # 3. Handle Tool Calls
-                    if response.tool_call:
+                    tool_call = response.tool_call
+                    if tool_call:
+                        # Don't hold buffered speech while tools (or confirmations) run
+                        self._flush_pending_pcm()
                         print("The tool was called")
                         function_responses = []
-                        for fc in response.tool_call.function_calls:
+                        for fc in tool_call.function_calls:
                             if fc.name in ["generate_cad", "run_web_agent", "write_file", "read_directory", "read_file", "create_project", "switch_project", "list_projects", "list_smart_devices", "control_light", "discover_printers", "print_stl", "get_print_status", "iterate_cad"]:
                                 prompt = fc.args.get("prompt", "") # Prompt is not present for all tools
                                 
@@ -732,12 +857,10 @@ class AudioLoop:
                                     pass
                                 else:
                                     # Confirmation Logic
-                                    if self.on_tool_confirmation:
-                                        import uuid
-                                        request_id = str(uuid.uuid4())
+                                    request_id = next(_confirmation_ids)
                                     print(f"[ADA DEBUG] [STOP] Requesting confirmation for '{fc.name}' (ID: {request_id})")
                                     
-                                    future = asyncio.Future()
+                                    future = asyncio.get_running_loop().create_future()
                                     self._pending_confirmations[request_id] = future
                                     
                                     self.on_tool_confirmation({
@@ -747,36 +870,21 @@ class AudioLoop:
                                     })
                                     
                                     try:
-                                        # Wait for user response
-                                        confirmed = await future
-
+                                        # Wait for user response; a closed or unattended frontend must not stall the session forever
+                                        confirmed = await asyncio.wait_for(future, CONFIRMATION_TIMEOUT)
+                                    except asyncio.TimeoutError:
+                                        print(f"[ADA DEBUG] [WARN] Confirmation {request_id} timed out after {CONFIRMATION_TIMEOUT}s. Treating as denied.")
+                                        confirmed = False
                                     finally:
-                                        self._pending_confirmations.pop(request_id, None)
+                                        # Timed out or cancelled while still pending (stop() already dismissed its own)
+                                        if self._pending_confirmations.pop(request_id, None) is not None and future.cancelled():
+                                            self._dismiss_tool_confirmation(request_id)
 
                                     print(f"[ADA DEBUG] [CONFIRM] Request {request_id} resolved. Confirmed: {confirmed}")
 
                                     if not confirmed:
                                         print(f"[ADA DEBUG] [DENY] Tool call '{fc.name}' denied by user.")
-                                        function_response = types.FunctionResponse(
-                                            id=fc.id,
-                                            name=fc.name,
-                                            response={
-                                                "result": "User denied the request to use this tool.",
-                                            }
-                                        )
-                                        function_responses.append(function_response)
-                                        continue
-
-                                    if not confirmed:
-                                        print(f"[ADA DEBUG] [DENY] Tool call '{fc.name}' denied by user.")
-                                        function_response = types.FunctionResponse(
-                                            id=fc.id,
-                                            name=fc.name,
-                                            response={
-                                                "result": "User denied the request to use this tool.",
-                                            }
-                                        )
-                                        function_responses.append(function_response)
+                                        function_responses.append(ack_response(fc, TOOL_DENIED_TEXT))
                                         continue
 
                                 # If confirmed (or no callback configured, or auto-allowed), proceed
@@ -792,14 +900,7 @@ class AudioLoop:
                                     print(f"[ADA DEBUG] [TOOL] Tool Call: 'run_web_agent' with prompt='{prompt}'")
                                     asyncio.create_task(self.handle_web_agent_request(prompt))
                                     
-                                    result_text = "Web Navigation started. Do not reply to this message."
-                                    function_response = types.FunctionResponse(
-                                        id=fc.id,
-                                        name=fc.name,
-                                        response={
-                                            "result": result_text,
-                                        }
-                                    )
+                                    function_response = ack_response(fc, WEB_ACK_TEXT)
                                     print(f"[ADA DEBUG] [RESPONSE] Sending function response: {function_response}")
                                     function_responses.append(function_response)
 
@@ -810,28 +911,19 @@ class AudioLoop:
                                     content = fc.args["content"]
                                     print(f"[ADA DEBUG] [TOOL] Tool Call: 'write_file' path='{path}'")
                                     asyncio.create_task(self.handle_write_file(path, content))
-                                    function_response = types.FunctionResponse(
-                                        id=fc.id, name=fc.name, response={"result": "Writing file..."}
-                                    )
-                                    function_responses.append(function_response)
+                                    function_responses.append(ack_response(fc, WRITE_FILE_ACK_TEXT))
 
                                 elif fc.name == "read_directory":
                                     path = fc.args["path"]
                                     print(f"[ADA DEBUG] [TOOL] Tool Call: 'read_directory' path='{path}'")
                                     asyncio.create_task(self.handle_read_directory(path))
-                                    function_response = types.FunctionResponse(
-                                        id=fc.id, name=fc.name, response={"result": "Reading directory..."}
-                                    )
-                                    function_responses.append(function_response)
+                                    function_responses.append(ack_response(fc, READ_DIRECTORY_ACK_TEXT))
 
                                 elif fc.name == "read_file":
                                     path = fc.args["path"]
                                     print(f"[ADA DEBUG] [TOOL] Tool Call: 'read_file' path='{path}'")
                                     asyncio.create_task(self.handle_read_file(path))
-                                    function_response = types.FunctionResponse(
-                                        id=fc.id, name=fc.name, response={"result": "Reading file..."}
-                                    )
-                                    function_responses.append(function_response)
+                                    function_responses.append(ack_response(fc, READ_FILE_ACK_TEXT))
 
                                 elif fc.name == "create_project":
                                     name = fc.args["name"]
@@ -880,36 +972,11 @@ class AudioLoop:
                                     # Use cached devices directly for speed
                                     # devices_dict is {ip: SmartDevice}
                                     
-                                    dev_summaries = []
-                                    frontend_list = []
-                                    
-                                    for ip, d in self.kasa_agent.devices.items():
-                                        dev_type = "unknown"
-                                        if d.is_bulb: dev_type = "bulb"
-                                        elif d.is_plug: dev_type = "plug"
-                                        elif d.is_strip: dev_type = "strip"
-                                        elif d.is_dimmer: dev_type = "dimmer"
-                                        
-                                        # Format for Model
-                                        info = f"{d.alias} (IP: {ip}, Type: {dev_type})"
-                                        if d.is_on:
-                                            info += " [ON]"
-                                        else:
-                                            info += " [OFF]"
-                                        dev_summaries.append(info)
-                                        
-                                        # Format for Frontend
-                                        frontend_list.append({
-                                            "ip": ip,
-                                            "alias": d.alias,
-                                            "model": d.model,
-                                            "type": dev_type,
-                                            "is_on": d.is_on,
-                                            "brightness": d.brightness if d.is_bulb or d.is_dimmer else None,
-                                            "hsv": d.hsv if d.is_bulb and d.is_color else None,
-                                            "has_color": d.is_color if d.is_bulb else False,
-                                            "has_brightness": d.is_dimmable if d.is_bulb or d.is_dimmer else False
-                                        })
+                                    frontend_list = self.kasa_agent.get_devices_list()
+                                    dev_summaries = [
+                                        f"{d['alias']} (IP: {d['ip']}, Type: {d['type']})" + (" [ON]" if d['is_on'] else " [OFF]")
+                                        for d in frontend_list
+                                    ]
                                     
                                     result_str = "No devices found in cache."
                                     if dev_summaries:
@@ -960,36 +1027,8 @@ class AudioLoop:
 
                                     # Notify Frontend of State Change
                                     if success:
-                                        # We don't need full discovery, just refresh known state or push update
-                                        # But for simplicity, let's get the standard list representation
-                                        # KasaAgent updates its internal state on control, so we can rebuild the list
-                                        
-                                        # Quick rebuild of list from internal dict
-                                        updated_list = []
-                                        for ip, dev in self.kasa_agent.devices.items():
-                                            # We need to ensure we have the correct dict structure expected by frontend
-                                            # We duplicate logic from KasaAgent.discover_devices a bit, but that's okay for now or we can add a helper
-                                            # Ideally KasaAgent has a 'get_devices_list()' method.
-                                            # Use the cached objects in self.kasa_agent.devices
-                                            
-                                            dev_type = "unknown"
-                                            if dev.is_bulb: dev_type = "bulb"
-                                            elif dev.is_plug: dev_type = "plug"
-                                            elif dev.is_strip: dev_type = "strip"
-                                            elif dev.is_dimmer: dev_type = "dimmer"
-
-                                            d_info = {
-                                                "ip": ip,
-                                                "alias": dev.alias,
-                                                "model": dev.model,
-                                                "type": dev_type,
-                                                "is_on": dev.is_on,
-                                                "brightness": dev.brightness if dev.is_bulb or dev.is_dimmer else None,
-                                                "hsv": dev.hsv if dev.is_bulb and dev.is_color else None,
-                                                "has_color": dev.is_color if dev.is_bulb else False,
-                                                "has_brightness": dev.is_dimmable if dev.is_bulb or dev.is_dimmer else False
-                                            }
-                                            updated_list.append(d_info)
+                                        # KasaAgent tracks the state it just set, so the cached list is current
+                                        updated_list = self.kasa_agent.get_devices_list()
                                             
                                         if self.on_device_update:
                                             self.on_device_update(updated_list)
@@ -1117,8 +1156,8 @@ class AudioLoop:
                 # Turn/Response Loop Finished
                 self.flush_chat()
 
-                while not self.audio_in_queue.empty():
-                    self.audio_in_queue.get_nowait()
+                self._pending_pcm.clear()
+                self.audio_in_queue.clear()
         except Exception as e:
             print(f"Error in receive_audio: {e}")
             traceback.print_exc()
@@ -1142,35 +1181,93 @@ class AudioLoop:
 
     async def get_frames(self):
         cap = await asyncio.to_thread(cv2.VideoCapture, 0, cv2.CAP_AVFOUNDATION)
+        # We sample ~1 frame/s; keep the driver from handing us stale buffered frames
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        cap.set(cv2.CAP_PROP_FPS, 2)
+        next_tick = time.monotonic()
         while True:
             if self.paused:
                 await asyncio.sleep(0.1)
+                next_tick = time.monotonic()
                 continue
             frame = await asyncio.to_thread(self._get_frame, cap)
             if frame is None:
                 break
-            await asyncio.sleep(1.0)
             if self.out_queue:
                 await self.out_queue.put(frame)
+            next_tick = await self._wait_next_tick(next_tick)
         cap.release()
 
+    @staticmethod
+    async def _wait_next_tick(next_tick, period=1.0):
+        # Fixed-rate pacing: capture/encode time comes out of the period instead
+        # of being added to it, and frames are sent as soon as they're taken.
+        next_tick += period
+        now = time.monotonic()
+        if next_tick < now:
+            next_tick = now
+        await asyncio.sleep(next_tick - now)
+        return next_tick
+
     def _get_frame(self, cap):
         ret, frame = cap.read()
         if not ret:
             return None
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img = PIL.Image.fromarray(frame_rgb)
-        img.thumbnail([1024, 1024])
-        image_io = io.BytesIO()
-        img.save(image_io, format="jpeg")
-        image_io.seek(0)
-        image_bytes = image_io.read()
-        return {"mime_type": "image/jpeg", "data": base64.b64encode(image_bytes).decode()}
-
-    async def _get_screen(self):
-        pass 
+        return self._encode_frame(frame)
+
+    def _encode_frame(self, frame):
+        # Downscale to fit 1024x1024 and encode straight from BGR (no PIL round-trip)
+        h, w = frame.shape[:2]
+        scale = min(1024 / h, 1024 / w, 1.0)
+        if scale < 1.0:
+            out_w, out_h = int(w * scale), int(h * scale)
+            out_shape = (out_h, out_w) + frame.shape[2:]
+            if self._resize_buf is None or self._resize_buf.shape != out_shape:
+                self._resize_buf = np.empty(out_shape, dtype=np.uint8)
+            frame = cv2.resize(frame, (out_w, out_h), dst=self._resize_buf, interpolation=cv2.INTER_AREA)
+
+        ok, buf = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 80])
+        if not ok:
+            return None
+        # Encode straight from the ndarray buffer instead of copying it out with tobytes()
+        return {"mime_type": "image/jpeg", "data": base64.b64encode(buf).decode()}
+
+    def _get_screen(self, sct):
+        shot = sct.grab(sct.monitors[0])
+        # Skip convert/encode/upload entirely when nothing on screen changed
+        digest = hashlib.blake2b(shot.raw, digest_size=8).digest()
+        if digest == self._last_screen_hash:
+            return None
+        self._last_screen_hash = digest
+        # View mss's BGRA buffer in place instead of copying it out; resize works on
+        # four channels and the JPEG encoder drops alpha itself
+        frame = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+        return self._encode_frame(frame)
+
     async def get_screen(self):
-         pass
+        # mss handles are bound to the thread that opened them, so keep one open
+        # on a dedicated thread for the life of the loop instead of one per grab
+        loop = asyncio.get_running_loop()
+        # Runs once per Live session; a fresh session has seen no frame yet, so the
+        # first grab must go out even if the screen matches the previous session's last one
+        self._last_screen_hash = None
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="screen")
+        sct = await loop.run_in_executor(executor, mss.mss)
+        try:
+            next_tick = time.monotonic()
+            while True:
+                if self.paused:
+                    await asyncio.sleep(0.1)
+                    next_tick = time.monotonic()
+                    continue
+                frame = await loop.run_in_executor(executor, self._get_screen, sct)
+                # None means the screen is unchanged since the last frame we sent
+                if frame is not None and self.out_queue:
+                    await self.out_queue.put(frame)
+                next_tick = await self._wait_next_tick(next_tick)
+        finally:
+            executor.submit(sct.close)
+            executor.shutdown(wait=False)
 
     async def run(self, start_message=None):
         retry_delay = 1
@@ -1185,7 +1282,7 @@ class AudioLoop:
                 ):
                     self.session = session
 
-                    self.audio_in_queue = asyncio.Queue()
+                    self.audio_in_queue = ClearableQueue()
                     self.out_queue = asyncio.Queue(maxsize=10)
 
                     tg.create_task(self.send_realtime())
@@ -1204,7 +1301,8 @@ class AudioLoop:
                     if not is_reconnect:
                         if start_message:
                             print(f"[ADA DEBUG] [INFO] Sending start message: {start_message}")
-                            await self.session.send(input=start_message, end_of_turn=True)
+                            # Fire as a task so project sync / stop-wait don't wait on the round trip
+                            tg.create_task(self.session.send(input=start_message, end_of_turn=True))
                         
                         # Sync Project State
                         if self.on_project_update and self.project_manager:
@@ -1267,27 +1365,33 @@ class AudioLoop:
                     except: 
                         pass
 
-def get_input_devices():
-    p = pyaudio.PyAudio()
-    info = p.get_host_api_info_by_index(0)
+DEVICE_LIST_TTL = 2.0 # Seconds a device enumeration result is reused
+_device_list_cache = {}
+
+def _list_devices(channel_key):
+    """Lists (index, name) for host API 0 devices with channel_key > 0, cached for DEVICE_LIST_TTL."""
+    now = time.monotonic()
+    cached = _device_list_cache.get(channel_key)
+    if cached and now - cached[0] < DEVICE_LIST_TTL:
+        return list(cached[1])
+
+    # Reuse the module-level PortAudio instance instead of initializing a new one per call
+    info = pya.get_host_api_info_by_index(0)
     numdevices = info.get('deviceCount')
     devices = []
     for i in range(0, numdevices):
-        if (p.get_device_info_by_host_api_device_index(0, i).get('maxInputChannels')) > 0:
-            devices.append((i, p.get_device_info_by_host_api_device_index(0, i).get('name')))
-    p.terminate()
-    return devices
+        device_info = pya.get_device_info_by_host_api_device_index(0, i)
+        if device_info.get(channel_key, 0) > 0:
+            devices.append((i, device_info.get('name')))
+
+    _device_list_cache[channel_key] = (now, devices)
+    return list(devices)
+
+def get_input_devices():
+    return _list_devices('maxInputChannels')
 
 def get_output_devices():
-    p = pyaudio.PyAudio()
-    info = p.get_host_api_info_by_index(0)
-    numdevices = info.get('deviceCount')
-    devices = []
-    for i in range(0, numdevices):
-        if (p.get_device_info_by_host_api_device_index(0, i).get('maxOutputChannels')) > 0:
-            devices.append((i, p.get_device_info_by_host_api_device_index(0, i).get('name')))
-    p.terminate()
-    return devices
+    return _list_devices('maxOutputChannels')
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -1,10 +1,20 @@
 import asyncio
-from kasa import Discover, SmartDevice, SmartBulb, SmartPlug
+from kasa import Discover, SmartDevice, SmartBulb, SmartPlug, SmartStrip, SmartDimmer
+
+# Saved device "type" -> class, so known devices can be connected without a discovery probe
+DEVICE_CLASSES = {
+    "bulb": SmartBulb,
+    "plug": SmartPlug,
+    "strip": SmartStrip,
+    "dimmer": SmartDimmer,
+}
 
 class KasaAgent:
     def __init__(self, known_devices=None):
         self.devices = {}
         self.known_devices_config = known_devices or []
+        # State we've set since the last update(), keyed by IP; saves a refresh round-trip per command
+        self._last_state = {}
 
     async def initialize(self):
         """Initializes devices from the saved configuration."""
@@ -25,9 +35,20 @@ class KasaAgent:
     async def _add_known_device(self, ip, alias, info):
         """Adds a device from settings without discovery scan."""
         try:
-            # We can't know the exact class (Bulb/Plug) without connecting, 
-            # but Discover.discover_single might work, or just SmartDevice(ip)
-            # SmartDevice is the base class.
+            dev = None
+            # If we saved the device type, connect directly and skip the discovery probe
+            device_class = DEVICE_CLASSES.get(info.get('type'))
+            if device_class:
+                try:
+                    dev = device_class(ip)
+                    await dev.update()
+                    self.devices[ip] = dev
+                    print(f"[KasaAgent] Loaded known device: {dev.alias} ({ip})")
+                    return
+                except Exception as e:
+                    print(f"[KasaAgent] Direct connect to {ip} failed ({e}), falling back to discovery")
+
+            # Otherwise Discover.discover_single works out the exact class for us
             dev = await Discover.discover_single(ip)
             if dev:
                 await dev.update()
@@ -50,39 +71,77 @@ class KasaAgent:
         # User said: "If a device that is in settings can not be found just list as not found."
         # This implies we might want to mark them offline.
         
-        for ip, dev in found_devices.items():
-            await dev.update()
+        # Refresh every device concurrently: one network round-trip instead of N
+        results = await asyncio.gather(
+            *(dev.update() for dev in found_devices.values()),
+            return_exceptions=True
+        )
+        for (ip, dev), result in zip(found_devices.items(), results):
+            if isinstance(result, Exception):
+                print(f"[KasaAgent] Failed to update {ip}: {result}")
+                continue
             self.devices[ip] = dev
+            self._last_state.pop(ip, None)
             
-        device_list = []
-        for ip, dev in self.devices.items():
-            # Determine type and capabilities
-            dev_type = "unknown"
-            if dev.is_bulb:
-                dev_type = "bulb"
-            elif dev.is_plug:
-                dev_type = "plug"
-            elif dev.is_strip:
-                dev_type = "strip"
-            elif dev.is_dimmer:
-                dev_type = "dimmer"
-
-            device_info = {
-                "ip": ip,
-                "alias": dev.alias,
-                "model": dev.model,
-                "type": dev_type,
-                "is_on": dev.is_on,
-                "brightness": dev.brightness if dev.is_bulb or dev.is_dimmer else None,
-                "hsv": dev.hsv if dev.is_bulb and dev.is_color else None,
-                "has_color": dev.is_color if dev.is_bulb else False,
-                "has_brightness": dev.is_dimmable if dev.is_bulb or dev.is_dimmer else False
-            }
-            device_list.append(device_info)
-            
+        device_list = self.get_devices_list()
         print(f"Total Kasa devices (found + cached): {len(device_list)}")
         return device_list
 
+    async def rediscover(self):
+        """Forgets all cached devices and runs a fresh discovery scan."""
+        self.devices.clear()
+        self._last_state.clear()
+        return await self.discover_devices()
+
+    def device_info(self, ip, dev):
+        """Builds the frontend/tool representation of a device, including any state set since its last update."""
+        # Determine type and capabilities
+        dev_type = "unknown"
+        if dev.is_bulb:
+            dev_type = "bulb"
+        elif dev.is_plug:
+            dev_type = "plug"
+        elif dev.is_strip:
+            dev_type = "strip"
+        elif dev.is_dimmer:
+            dev_type = "dimmer"
+
+        info = {
+            "ip": ip,
+            "alias": dev.alias,
+            "model": dev.model,
+            "type": dev_type,
+            "is_on": dev.is_on,
+            "brightness": dev.brightness if dev.is_bulb or dev.is_dimmer else None,
+            "hsv": dev.hsv if dev.is_bulb and dev.is_color else None,
+            "has_color": dev.is_color if dev.is_bulb else False,
+            "has_brightness": dev.is_dimmable if dev.is_bulb or dev.is_dimmer else False
+        }
+        last = self._last_state.get(ip)
+        if last:
+            info.update(last)
+        return info
+
+    def get_devices_list(self):
+        """Returns all known devices from cache, without any network traffic."""
+        return [self.device_info(ip, dev) for ip, dev in self.devices.items()]
+
+    async def refresh(self, target):
+        """Fetches fresh state for a device (Target: IP or Alias)."""
+        dev = self._resolve_device(target)
+        if not dev:
+            return False
+        try:
+            await dev.update()
+        except Exception as e:
+            print(f"Error refreshing {target}: {e}")
+            return False
+        self._last_state.pop(dev.host, None)
+        return True
+
+    def _remember(self, dev, **state):
+        self._last_state.setdefault(dev.host, {}).update(state)
+
     def get_device_by_alias(self, alias):
         """Finds a device by its alias (case-insensitive)."""
         for ip, dev in self.devices.items():
@@ -130,7 +189,7 @@ class KasaAgent:
         if dev:
             try:
                 await dev.turn_on()
-                await dev.update()
+                self._remember(dev, is_on=True)
                 return True
             except Exception as e:
                 print(f"Error turning on {target}: {e}")
@@ -143,7 +202,7 @@ class KasaAgent:
                 if dev:
                     self.devices[target] = dev
                     await dev.turn_on()
-                    await dev.update()
+                    self._remember(dev, is_on=True)
                     return True
              except Exception:
                  pass
@@ -155,7 +214,7 @@ class KasaAgent:
         if dev:
             try:
                 await dev.turn_off()
-                await dev.update()
+                self._remember(dev, is_on=False)
                 return True
             except Exception as e:
                 print(f"Error turning off {target}: {e}")
@@ -167,19 +226,27 @@ class KasaAgent:
                 if dev:
                     self.devices[target] = dev
                     await dev.turn_off()
-                    await dev.update()
+                    self._remember(dev, is_on=False)
                     return True
              except Exception:
                  pass
         return False
 
+    async def turn_on_many(self, targets):
+        """Turns on several devices concurrently. Returns a list of per-target results."""
+        return await asyncio.gather(*(self.turn_on(t) for t in targets))
+
+    async def turn_off_many(self, targets):
+        """Turns off several devices concurrently. Returns a list of per-target results."""
+        return await asyncio.gather(*(self.turn_off(t) for t in targets))
+
     async def set_brightness(self, target, brightness):
         """Sets brightness (0-100)."""
         dev = self._resolve_device(target)
         if dev and (dev.is_dimmable or dev.is_bulb):
             try:
                 await dev.set_brightness(int(brightness))
-                await dev.update()
+                self._remember(dev, brightness=int(brightness))
                 return True
             except Exception as e:
                  print(f"Error setting brightness for {target}: {e}")
@@ -201,7 +268,7 @@ class KasaAgent:
             try:
                 # Kasa expects Hue (0-360), Sat (0-100), Val (0-100)
                 await dev.set_hsv(int(hsv[0]), int(hsv[1]), int(hsv[2]))
-                await dev.update()
+                self._remember(dev, hsv=(int(hsv[0]), int(hsv[1]), int(hsv[2])))
                 return True
             except Exception as e:
                  print(f"Error setting color for {target}: {e}")
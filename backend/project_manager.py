@@ -4,6 +4,19 @@ import shutil
 import time
 from pathlib import Path
 
+try:
+    import orjson
+
+    def _dumps(obj):
+        return orjson.dumps(obj)
+
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj).encode("utf-8")
+
+    _loads = json.loads
+
 class ProjectManager:
     def __init__(self, workspace_root: str):
         self.workspace_root = Path(workspace_root)
@@ -63,8 +76,8 @@ class ProjectManager:
             "sender": sender,
             "text": text
         }
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(entry) + "\n")
+        with open(log_file, "ab") as f:
+            f.write(_dumps(entry) + b"\n")
 
     def save_cad_artifact(self, source_path: str, prompt: str):
         """Copies a generated CAD file to the project's 'cad' folder."""
@@ -155,7 +168,7 @@ class ProjectManager:
             history = []
             for line in lines[-limit:]:
                 try:
-                    entry = json.loads(line)
+                    entry = _loads(line)
                     history.append(entry)
                 except json.JSONDecodeError:
                     continue
@@ -9,25 +9,42 @@ if sys.platform == 'win32':
 import socketio
 import uvicorn
 from fastapi import FastAPI
-import asyncio
+from fastapi.responses import Response
 import threading
-import sys
 import os
 import json
-from datetime import datetime
+import time
+import queue
+import logging
+import collections
+from logging.handlers import QueueHandler, QueueListener
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Any
 
-
-
-# Ensure we can import jarvis
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-
+# server.py is launched as a script (`python backend/server.py`), so its own directory
+# is already sys.path[0] and the sibling modules resolve without touching sys.path
 import jarvis
 from authenticator import FaceAuthenticator
 from kasa_agent import KasaAgent
 
+# Logging goes through a queue: handlers only enqueue records and a listener thread does
+# the blocking stdout writes, so the event loop never stalls on the console.
+# Only the server's own logger is routed here; the root logger (and with it every
+# third-party library) is left alone.
+log_queue = queue.SimpleQueue()
+log_listener = QueueListener(log_queue, logging.StreamHandler(sys.stdout))
+log_listener.start()
+logger = logging.getLogger("jarvis.server")
+logger.setLevel(logging.INFO)
+logger.addHandler(QueueHandler(log_queue))
+logger.propagate = False
+
 # Create a Socket.IO server
-sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+# msgpack instead of JSON: binary payloads (audio, frames) ride inline and numeric
+# CAD/browser payloads encode far smaller. The frontend uses socket.io-msgpack-parser.
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*', serializer='msgpack')
 app = FastAPI()
 app_socketio = socketio.ASGIApp(sio, app)
 
@@ -35,26 +52,44 @@ import signal
 
 # --- SHUTDOWN HANDLER ---
 def signal_handler(sig, frame):
-    print(f"\n[SERVER] Caught signal {sig}. Exiting gracefully...")
+    logger.info(f"[SERVER] Caught signal {sig}. Exiting gracefully...")
     # Clean up audio loop
-    if audio_loop:
+    if state.audio_loop:
         try:
-            print("[SERVER] Stopping Audio Loop...")
-            audio_loop.stop() 
+            logger.info("[SERVER] Stopping Audio Loop...")
+            state.audio_loop.stop() 
         except:
             pass
     # Force kill
-    print("[SERVER] Force exiting...")
+    logger.info("[SERVER] Force exiting...")
+    log_listener.stop() # Flush queued log lines before the hard exit
     os._exit(0)
 
 signal.signal(signal.SIGINT, signal_handler)
 signal.signal(signal.SIGTERM, signal_handler)
 
-# Global state
-audio_loop = None
-loop_task = None
-authenticator = None
-kasa_agent = KasaAgent()
+@dataclass(slots=True)
+class AppState:
+    """Live session objects shared by the socket handlers."""
+    audio_loop: Any = None
+    loop_task: Any = None
+    authenticator: Any = None
+    # Drainer task emitting visualiser audio for the current session
+    audio_emit_task: Any = None
+    # In-flight Kasa discovery scan shared by concurrent callers, and when the last one finished
+    kasa_discovery_task: Any = None
+    kasa_discovered_at: float = 0.0
+    # Client that started (or re-joined) the audio session; its visualiser audio goes
+    # straight to it (None = broadcast). Everything else is still broadcast.
+    session_sid: Any = None
+    # Serializes start_audio/stop_audio so concurrent clients can't race the loop lifecycle
+    audio_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+state = AppState()
+app.state.jarvis = state
+# Memory dumps are written on their own single worker so saves land in order
+# and never queue behind other blocking work in the default executor.
+memory_io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-io")
 SETTINGS_FILE = "settings.json"
 
 DEFAULT_SETTINGS = {
@@ -70,7 +105,7 @@ DEFAULT_SETTINGS = {
         "list_projects": True
     },
     "printers": [], # List of {host, port, name, type}
-    "kasa_devices": [], # List of {ip, alias, model}
+    "kasa_devices": [], # List of {ip, alias, model, type}
     "camera_flipped": False # Invert cursor horizontal direction
 }
 
@@ -89,263 +124,326 @@ def load_settings():
                          SETTINGS["tool_permissions"].update(v)
                     else:
                         SETTINGS[k] = v
-            print(f"Loaded settings: {SETTINGS}")
+            logger.info(f"Loaded settings: {SETTINGS}")
         except Exception as e:
-            print(f"Error loading settings: {e}")
+            logger.error(f"Error loading settings: {e}")
 
 def save_settings():
     try:
         with open(SETTINGS_FILE, 'w') as f:
             json.dump(SETTINGS, f, indent=4)
-        print("Settings saved.")
+        logger.info("Settings saved.")
     except Exception as e:
-        print(f"Error saving settings: {e}")
+        logger.error(f"Error saving settings: {e}")
 
 # Load on startup
 load_settings()
 
-authenticator = None
+# --- OUTBOUND EMIT QUEUE ---
+# AudioLoop callbacks are plain functions; rather than spawning a Task per
+# event they append to this deque and a single drainer task emits in order.
+_outbox = collections.deque()
+_outbox_event = asyncio.Event()
+
+def post_emit(event, data):
+    _outbox.append((event, data))
+    _outbox_event.set()
+
+# Model audio for the visualiser goes through its own bounded queue: chunks that
+# pile up while an emit is in flight are joined into one binary frame.
+AUDIO_QUEUE_SIZE = 64
+AUDIO_EMIT_MAX_BYTES = 32 * 1024
+
+async def drain_audio(queue):
+    while True:
+        chunks = [await queue.get()]
+        total = len(chunks[0])
+        while total < AUDIO_EMIT_MAX_BYTES and not queue.empty():
+            chunk = queue.get_nowait()
+            chunks.append(chunk)
+            total += len(chunk)
+        data = chunks[0] if len(chunks) == 1 else b''.join(chunks)
+        try:
+            await sio.emit('audio_data', {'data': data}, room=state.session_sid)
+        except Exception as e:
+            logger.error(f"[SERVER] Failed to emit audio: {e}")
+
+def stop_audio_emitter():
+    if state.audio_emit_task:
+        state.audio_emit_task.cancel()
+        state.audio_emit_task = None
+
+async def drain_outbox():
+    while True:
+        await _outbox_event.wait()
+        _outbox_event.clear()
+        while _outbox:
+            event, data = _outbox.popleft()
+            try:
+                await sio.emit(event, data)
+            except Exception as e:
+                logger.error(f"[SERVER] Failed to emit '{event}': {e}")
+
 kasa_agent = KasaAgent(known_devices=SETTINGS.get("kasa_devices"))
 # tool_permissions is now SETTINGS["tool_permissions"]
 
+# Callback for Auth Status
+async def on_auth_status(is_auth):
+    logger.info(f"[SERVER] Auth status change: {is_auth}")
+    await sio.emit('auth_status', {'authenticated': is_auth})
+
+# Callback for Auth Camera Frames
+async def on_auth_frame(frame_b64):
+    await sio.emit('auth_frame', {'image': frame_b64})
+
 @app.on_event("startup")
 async def startup_event():
-    import sys
-    print(f"[SERVER DEBUG] Startup Event Triggered")
-    print(f"[SERVER DEBUG] Python Version: {sys.version}")
+    logger.debug(f"[SERVER DEBUG] Startup Event Triggered")
+    logger.debug(f"[SERVER DEBUG] Python Version: {sys.version}")
     try:
         loop = asyncio.get_running_loop()
-        print(f"[SERVER DEBUG] Running Loop: {type(loop)}")
+        logger.debug(f"[SERVER DEBUG] Running Loop: {type(loop)}")
         policy = asyncio.get_event_loop_policy()
-        print(f"[SERVER DEBUG] Current Policy: {type(policy)}")
+        logger.debug(f"[SERVER DEBUG] Current Policy: {type(policy)}")
     except Exception as e:
-        print(f"[SERVER DEBUG] Error checking loop: {e}")
+        logger.error(f"[SERVER DEBUG] Error checking loop: {e}")
+
+    asyncio.create_task(drain_outbox())
+
+    # Build the authenticator up front so model loading and reference-face extraction
+    # happen before the first client connects, not inside its handshake
+    logger.info("[SERVER] Startup: Initializing Face Authenticator...")
+    state.authenticator = FaceAuthenticator(
+        reference_image_path="reference.jpg",
+        on_status_change=on_auth_status,
+        on_frame=on_auth_frame
+    )
 
-    print("[SERVER] Startup: Initializing Kasa Agent...")
+    MEMORY_DIR.mkdir(exist_ok=True)
+
+    logger.info("[SERVER] Startup: Initializing Kasa Agent...")
     await kasa_agent.initialize()
 
+# Static liveness payload: encoded once, returned as-is on every probe
+STATUS_RESPONSE = Response(content=b'{"status":"running","service":"JARVIS Backend"}', media_type="application/json")
+
 @app.get("/status")
 async def status():
-    return {"status": "running", "service": "JARVIS Backend"}
+    return STATUS_RESPONSE
 
 @sio.event
 async def connect(sid, environ):
-    print(f"Client connected: {sid}")
+    logger.info(f"Client connected: {sid}")
     await sio.emit('status', {'msg': 'Connected to JARVIS Backend'}, room=sid)
 
-    global authenticator
-    
-    # Callback for Auth Status
-    async def on_auth_status(is_auth):
-        print(f"[SERVER] Auth status change: {is_auth}")
-        await sio.emit('auth_status', {'authenticated': is_auth})
-
-    # Callback for Auth Camera Frames
-    async def on_auth_frame(frame_b64):
-        await sio.emit('auth_frame', {'image': frame_b64})
-
-    # Initialize Authenticator if not already done
-    if authenticator is None:
-        authenticator = FaceAuthenticator(
-            reference_image_path="reference.jpg",
-            on_status_change=on_auth_status,
-            on_frame=on_auth_frame
-        )
-    
     # Check if already authenticated or needs to start
-    if authenticator.authenticated:
+    if state.authenticator.authenticated:
         await sio.emit('auth_status', {'authenticated': True})
     else:
         # Check Settings for Auth
         if SETTINGS.get("face_auth_enabled", False):
             await sio.emit('auth_status', {'authenticated': False})
             # Start the auth loop in background
-            asyncio.create_task(authenticator.start_authentication_loop())
+            asyncio.create_task(state.authenticator.start_authentication_loop())
         else:
             # Bypass Auth
-            print("Face Auth Disabled. Auto-authenticating.")
+            logger.info("Face Auth Disabled. Auto-authenticating.")
             # We don't change authenticator state to true to avoid confusion if re-enabled? 
             # Or we should just tell client it's auth'd.
             await sio.emit('auth_status', {'authenticated': True})
 
 @sio.event
 async def disconnect(sid):
-    print(f"Client disconnected: {sid}")
+    logger.info(f"Client disconnected: {sid}")
+    if state.session_sid == sid:
+        state.session_sid = None
 
 @sio.event
 async def start_audio(sid, data=None):
-    global audio_loop, loop_task
-    
-    # Optional: Block if not authenticated
-    # Only block if auth is ENABLED and not authenticated
-    if SETTINGS.get("face_auth_enabled", False):
-        if authenticator and not authenticator.authenticated:
-            print("Blocked start_audio: Not authenticated.")
-            await sio.emit('error', {'msg': 'Authentication Required'})
-            return
+    async with state.audio_lock:
+        # Optional: Block if not authenticated
+        # Only block if auth is ENABLED and not authenticated
+        if SETTINGS.get("face_auth_enabled", False):
+            if state.authenticator and not state.authenticator.authenticated:
+                logger.warning("Blocked start_audio: Not authenticated.")
+                await sio.emit('error', {'msg': 'Authentication Required'})
+                return
 
-    print("Starting Audio Loop...")
+        logger.info("Starting Audio Loop...")
     
-    device_index = None
-    device_name = None
-    if data:
-        if 'device_index' in data:
-            device_index = data['device_index']
-        if 'device_name' in data:
-            device_name = data['device_name']
+        device_index = None
+        device_name = None
+        if data:
+            if 'device_index' in data:
+                device_index = data['device_index']
+            if 'device_name' in data:
+                device_name = data['device_name']
             
-    print(f"Using input device: Name='{device_name}', Index={device_index}")
-    
-    if audio_loop:
-        if loop_task and (loop_task.done() or loop_task.cancelled()):
-             print("Audio loop task appeared finished/cancelled. Clearing and restarting...")
-             audio_loop = None
-             loop_task = None
-        else:
-            print("Audio loop already running. Re-connecting client to session.")
-            await sio.emit('status', {'msg': 'JARVIS Already Running'})
-            return
-
-
-    # Callback to send audio data to frontend
-    def on_audio_data(data_bytes):
-        # We need to schedule this on the event loop
-        # This is high frequency, so we might want to downsample or batch if it's too much
-        asyncio.create_task(sio.emit('audio_data', {'data': list(data_bytes)}))
-
-    # Callback to send CAL data to frontend
-    def on_cad_data(data):
-        info = f"{len(data.get('vertices', []))} vertices" if 'vertices' in data else f"{len(data.get('data', ''))} bytes (STL)"
-        print(f"Sending CAD data to frontend: {info}")
-        asyncio.create_task(sio.emit('cad_data', data))
-
-    # Callback to send Browser data to frontend
-    def on_web_data(data):
-        print(f"Sending Browser data to frontend: {len(data.get('log', ''))} chars logs")
-        asyncio.create_task(sio.emit('browser_frame', data))
-        
-    # Callback to send Transcription data to frontend
-    def on_transcription(data):
-        # data = {"sender": "User"|"JARVIS", "text": "..."}
-        asyncio.create_task(sio.emit('transcription', data))
-
-    # Callback to send Confirmation Request to frontend
-    def on_tool_confirmation(data):
-        # data = {"id": "uuid", "tool": "tool_name", "args": {...}}
-        print(f"Requesting confirmation for tool: {data.get('tool')}")
-        asyncio.create_task(sio.emit('tool_confirmation_request', data))
-
-    # Callback to send CAD status to frontend
-    def on_cad_status(status):
-        # status can be: 
-        # - a string like "generating" (from jarvis.py handle_cad_request)
-        # - a dict with {status, attempt, max_attempts, error} (from CadAgent)
-        if isinstance(status, dict):
-            print(f"Sending CAD Status: {status.get('status')} (attempt {status.get('attempt')}/{status.get('max_attempts')})")
-            asyncio.create_task(sio.emit('cad_status', status))
-        else:
-            # Legacy: simple string
-            print(f"Sending CAD Status: {status}")
-            asyncio.create_task(sio.emit('cad_status', {'status': status}))
-
-    # Callback to send CAD thoughts to frontend (streaming)
-    def on_cad_thought(thought_text):
-        asyncio.create_task(sio.emit('cad_thought', {'text': thought_text}))
-
-    # Callback to send Project Update to frontend
-    def on_project_update(project_name):
-        print(f"Sending Project Update: {project_name}")
-        asyncio.create_task(sio.emit('project_update', {'project': project_name}))
-
-    # Callback to send Device Update to frontend
-    def on_device_update(devices):
-        # devices is a list of dicts
-        print(f"Sending Kasa Device Update: {len(devices)} devices")
-        asyncio.create_task(sio.emit('kasa_devices', devices))
-
-    # Callback to send Error to frontend
-    def on_error(msg):
-        print(f"Sending Error to frontend: {msg}")
-        asyncio.create_task(sio.emit('error', {'msg': msg}))
-
-    # Initialize JARVIS
-    try:
-        print(f"Initializing AudioLoop with device_index={device_index}")
-        audio_loop = jarvis.AudioLoop(
-            video_mode="none", 
-            on_audio_data=on_audio_data,
-            on_cad_data=on_cad_data,
-            on_web_data=on_web_data,
-            on_transcription=on_transcription,
-            on_tool_confirmation=on_tool_confirmation,
-            on_cad_status=on_cad_status,
-            on_cad_thought=on_cad_thought,
-            on_project_update=on_project_update,
-            on_device_update=on_device_update,
-            on_error=on_error,
-
-            input_device_index=device_index,
-            input_device_name=device_name,
-            kasa_agent=kasa_agent
-        )
-        print("AudioLoop initialized successfully.")
+        logger.info(f"Using input device: Name='{device_name}', Index={device_index}")
 
-        # Apply current permissions
-        audio_loop.update_permissions(SETTINGS["tool_permissions"])
+        state.session_sid = sid
+    
+        if state.audio_loop:
+            if state.loop_task and (state.loop_task.done() or state.loop_task.cancelled()):
+                 logger.info("Audio loop task appeared finished/cancelled. Clearing and restarting...")
+                 state.audio_loop = None
+                 state.loop_task = None
+            else:
+                logger.info("Audio loop already running. Re-connecting client to session.")
+                await sio.emit('status', {'msg': 'JARVIS Already Running'})
+                return
+
+
+        # Callback to send audio data to frontend
+        # One long-lived drainer emits binary frames instead of a Task per chunk
+        stop_audio_emitter()
+        audio_queue = asyncio.Queue(maxsize=AUDIO_QUEUE_SIZE)
+        state.audio_emit_task = asyncio.create_task(drain_audio(audio_queue))
+
+        def on_audio_data(data_bytes):
+            # Visualiser data only: drop the oldest chunk rather than let a slow client back us up
+            if audio_queue.full():
+                audio_queue.get_nowait()
+            audio_queue.put_nowait(data_bytes)
+
+        # Callback to send CAL data to frontend
+        def on_cad_data(data):
+            info = f"{len(data.get('vertices', []))} vertices" if 'vertices' in data else f"{len(data.get('data', ''))} bytes (STL)"
+            logger.info("Sending CAD data to frontend: %s", info)
+            post_emit('cad_data', data)
+
+        # Callback to send Browser data to frontend
+        def on_web_data(data):
+            logger.info("Sending Browser data to frontend: %d chars logs", len(data.get('log', '')))
+            post_emit('browser_frame', data)
+        
+        # Callback to send Transcription data to frontend
+        def on_transcription(data):
+            # data = {"sender": "User"|"JARVIS", "text": "..."}
+            post_emit('transcription', data)
+
+        # Callback to send Confirmation Request to frontend
+        def on_tool_confirmation(data):
+            # data = {"id": "uuid", "tool": "tool_name", "args": {...}}
+            logger.info("Requesting confirmation for tool: %s", data.get('tool'))
+            post_emit('tool_confirmation_request', data)
+
+        # Callback to withdraw a confirmation request that timed out or was cancelled
+        def on_tool_confirmation_dismissed(request_id):
+            logger.info("Dismissing confirmation request %s", request_id)
+            post_emit('tool_confirmation_dismissed', {'id': request_id})
+
+        # Callback to send CAD status to frontend
+        def on_cad_status(status):
+            # status can be: 
+            # - a string like "generating" (from jarvis.py handle_cad_request)
+            # - a dict with {status, attempt, max_attempts, error} (from CadAgent)
+            if isinstance(status, dict):
+                logger.info("Sending CAD Status: %s (attempt %s/%s)", status.get('status'), status.get('attempt'), status.get('max_attempts'))
+                post_emit('cad_status', status)
+            else:
+                # Legacy: simple string
+                logger.info("Sending CAD Status: %s", status)
+                post_emit('cad_status', {'status': status})
+
+        # Callback to send CAD thoughts to frontend (streaming)
+        def on_cad_thought(thought_text):
+            post_emit('cad_thought', {'text': thought_text})
+
+        # Callback to send Project Update to frontend
+        def on_project_update(project_name):
+            logger.info("Sending Project Update: %s", project_name)
+            post_emit('project_update', {'project': project_name})
+
+        # Callback to send Device Update to frontend
+        def on_device_update(devices):
+            # devices is a list of dicts
+            logger.info("Sending Kasa Device Update: %d devices", len(devices))
+            post_emit('kasa_devices', devices)
+
+        # Callback to send Error to frontend
+        def on_error(msg):
+            logger.error("Sending Error to frontend: %s", msg)
+            post_emit('error', {'msg': msg})
+
+        # Initialize JARVIS
+        try:
+            logger.info(f"Initializing AudioLoop with device_index={device_index}")
+            state.audio_loop = jarvis.AudioLoop(
+                video_mode="none", 
+                on_audio_data=on_audio_data,
+                on_cad_data=on_cad_data,
+                on_web_data=on_web_data,
+                on_transcription=on_transcription,
+                on_tool_confirmation=on_tool_confirmation,
+                on_tool_confirmation_dismissed=on_tool_confirmation_dismissed,
+                on_cad_status=on_cad_status,
+                on_cad_thought=on_cad_thought,
+                on_project_update=on_project_update,
+                on_device_update=on_device_update,
+                on_error=on_error,
+
+                input_device_index=device_index,
+                input_device_name=device_name,
+                kasa_agent=kasa_agent
+            )
+            logger.info("AudioLoop initialized successfully.")
+
+            # Apply current permissions
+            state.audio_loop.update_permissions(SETTINGS["tool_permissions"])
         
-        # Check initial mute state
-        if data and data.get('muted', False):
-            print("Starting with Audio Paused")
-            audio_loop.set_paused(True)
+            # Check initial mute state
+            if data and data.get('muted', False):
+                logger.info("Starting with Audio Paused")
+                state.audio_loop.set_paused(True)
 
-        print("Creating asyncio task for AudioLoop.run()")
-        loop_task = asyncio.create_task(audio_loop.run())
+            logger.info("Creating asyncio task for AudioLoop.run()")
+            state.loop_task = asyncio.create_task(state.audio_loop.run())
         
-        # Add a done callback to catch silent failures in the loop
-        def handle_loop_exit(task):
-            try:
-                task.result()
-            except asyncio.CancelledError:
-                print("Audio Loop Cancelled")
-            except Exception as e:
-                print(f"Audio Loop Crashed: {e}")
-                # You could emit 'error' here if you have context
+            # Add a done callback to catch silent failures in the loop
+            def handle_loop_exit(task):
+                try:
+                    task.result()
+                except asyncio.CancelledError:
+                    logger.info("Audio Loop Cancelled")
+                except Exception as e:
+                    logger.error(f"Audio Loop Crashed: {e}")
+                    # You could emit 'error' here if you have context
         
-        loop_task.add_done_callback(handle_loop_exit)
+            state.loop_task.add_done_callback(handle_loop_exit)
         
-        print("Emitting 'JARVIS Started'")
-        await sio.emit('status', {'msg': 'JARVIS Started'})
-
-        # Load saved printers
-        saved_printers = SETTINGS.get("printers", [])
-        if saved_printers and audio_loop.printer_agent:
-            print(f"[SERVER] Loading {len(saved_printers)} saved printers...")
-            for p in saved_printers:
-                audio_loop.printer_agent.add_printer_manually(
-                    name=p.get("name", p["host"]),
-                    host=p["host"],
-                    port=p.get("port", 80),
-                    printer_type=p.get("type", "moonraker"),
-                    camera_url=p.get("camera_url")
-                )
+            logger.info("Emitting 'JARVIS Started'")
+            await sio.emit('status', {'msg': 'JARVIS Started'})
+
+            # Load saved printers
+            saved_printers = SETTINGS.get("printers", [])
+            if saved_printers and state.audio_loop.printer_agent:
+                logger.info(f"[SERVER] Loading {len(saved_printers)} saved printers...")
+                for p in saved_printers:
+                    state.audio_loop.printer_agent.add_printer_manually(
+                        name=p.get("name", p["host"]),
+                        host=p["host"],
+                        port=p.get("port", 80),
+                        printer_type=p.get("type", "moonraker"),
+                        camera_url=p.get("camera_url")
+                    )
         
-        # Start Printer Monitor
-        asyncio.create_task(monitor_printers_loop())
+            # Start Printer Monitor
+            asyncio.create_task(monitor_printers_loop())
         
-    except Exception as e:
-        print(f"CRITICAL ERROR STARTING JARVIS: {e}")
-        import traceback
-        traceback.print_exc()
-        await sio.emit('error', {'msg': f"Failed to start: {str(e)}"})
-        audio_loop = None # Ensure we can try again
+        except Exception as e:
+            logger.exception(f"CRITICAL ERROR STARTING JARVIS: {e}")
+            await sio.emit('error', {'msg': f"Failed to start: {str(e)}"})
+            stop_audio_emitter()
+            state.audio_loop = None # Ensure we can try again
 
 
 async def monitor_printers_loop():
     """Background task to query printer status periodically."""
-    print("[SERVER] Starting Printer Monitor Loop")
-    while audio_loop and audio_loop.printer_agent:
+    logger.info("[SERVER] Starting Printer Monitor Loop")
+    while state.audio_loop and state.audio_loop.printer_agent:
         try:
-            agent = audio_loop.printer_agent
+            agent = state.audio_loop.printer_agent
             if not agent.printers:
                 await asyncio.sleep(5)
                 continue
@@ -365,36 +463,36 @@ async def monitor_printers_loop():
                         await sio.emit('print_status_update', res.to_dict())
                         
         except asyncio.CancelledError:
-            print("[SERVER] Printer Monitor Cancelled")
+            logger.info("[SERVER] Printer Monitor Cancelled")
             break
         except Exception as e:
-            print(f"[SERVER] Monitor Loop Error: {e}")
+            logger.error(f"[SERVER] Monitor Loop Error: {e}")
             
         await asyncio.sleep(2) # Update every 2 seconds for responsiveness
 
 @sio.event
 async def stop_audio(sid):
-    global audio_loop
-    if audio_loop:
-        audio_loop.stop() 
-        print("Stopping Audio Loop")
-        audio_loop = None
-        await sio.emit('status', {'msg': 'J.A.R.V.A.S Stopped'})
+    async with state.audio_lock:
+        if state.audio_loop:
+            state.audio_loop.stop() 
+            logger.info("Stopping Audio Loop")
+            state.audio_loop = None
+            state.session_sid = None
+            stop_audio_emitter()
+            await sio.emit('status', {'msg': 'J.A.R.V.A.S Stopped'})
 
 @sio.event
 async def pause_audio(sid):
-    global audio_loop
-    if audio_loop:
-        audio_loop.set_paused(True)
-        print("Pausing Audio")
+    if state.audio_loop:
+        state.audio_loop.set_paused(True)
+        logger.info("Pausing Audio")
         await sio.emit('status', {'msg': 'Audio Paused'})
 
 @sio.event
 async def resume_audio(sid):
-    global audio_loop
-    if audio_loop:
-        audio_loop.set_paused(False)
-        print("Resuming Audio")
+    if state.audio_loop:
+        state.audio_loop.set_paused(False)
+        logger.info("Resuming Audio")
         await sio.emit('status', {'msg': 'Audio Resumed'})
 
 @sio.event
@@ -403,104 +501,112 @@ async def confirm_tool(sid, data):
     request_id = data.get('id')
     confirmed = data.get('confirmed', False)
     
-    print(f"[SERVER DEBUG] Received confirmation response for {request_id}: {confirmed}")
+    logger.debug("[SERVER DEBUG] Received confirmation response for %s: %s", request_id, confirmed)
     
+    audio_loop = state.audio_loop
     if audio_loop:
         audio_loop.resolve_tool_confirmation(request_id, confirmed)
     else:
-        print("Audio loop not active, cannot resolve confirmation.")
+        logger.warning("Audio loop not active, cannot resolve confirmation.")
 
 @sio.event
 async def shutdown(sid, data=None):
     """Gracefully shutdown the server when the application closes."""
-    global audio_loop, loop_task, authenticator
-    
-    print("[SERVER] ========================================")
-    print("[SERVER] SHUTDOWN SIGNAL RECEIVED FROM FRONTEND")
-    print("[SERVER] ========================================")
+    logger.info("[SERVER] ========================================")
+    logger.info("[SERVER] SHUTDOWN SIGNAL RECEIVED FROM FRONTEND")
+    logger.info("[SERVER] ========================================")
     
     # Stop audio loop
-    if audio_loop:
-        print("[SERVER] Stopping Audio Loop...")
-        audio_loop.stop()
-        audio_loop = None
+    if state.audio_loop:
+        logger.info("[SERVER] Stopping Audio Loop...")
+        state.audio_loop.stop()
+        state.audio_loop = None
     
     # Cancel the loop task if running
-    if loop_task and not loop_task.done():
-        print("[SERVER] Cancelling loop task...")
-        loop_task.cancel()
-        loop_task = None
+    if state.loop_task and not state.loop_task.done():
+        logger.info("[SERVER] Cancelling loop task...")
+        state.loop_task.cancel()
+        state.loop_task = None
     
     # Stop authenticator if running
-    if authenticator:
-        print("[SERVER] Stopping Authenticator...")
-        authenticator.stop()
+    if state.authenticator:
+        logger.info("[SERVER] Stopping Authenticator...")
+        state.authenticator.stop()
     
-    print("[SERVER] Graceful shutdown complete. Terminating process...")
+    logger.info("[SERVER] Graceful shutdown complete. Terminating process...")
     
     # Force exit immediately - os._exit bypasses cleanup but ensures termination
+    log_listener.stop() # Flush queued log lines first
     os._exit(0)
 
 @sio.event
 async def user_input(sid, data):
     text = data.get('text')
-    print(f"[SERVER DEBUG] User input received: '{text}'")
+    logger.debug("[SERVER DEBUG] User input received: '%s'", text)
     
+    # Bind once: the loop can be swapped out by stop/start while we await below
+    audio_loop = state.audio_loop
     if not audio_loop:
-        print("[SERVER DEBUG] [Error] Audio loop is None. Cannot send text.")
+        logger.error("[SERVER DEBUG] [Error] Audio loop is None. Cannot send text.")
         return
 
-    if not audio_loop.session:
-        print("[SERVER DEBUG] [Error] Session is None. Cannot send text.")
+    session = audio_loop.session
+    if not session:
+        logger.error("[SERVER DEBUG] [Error] Session is None. Cannot send text.")
         return
 
     if text:
-        print(f"[SERVER DEBUG] Sending message to model: '{text}'")
+        logger.debug("[SERVER DEBUG] Sending message to model: '%s'", text)
         
         # Log User Input to Project History
-        if audio_loop and audio_loop.project_manager:
+        if audio_loop.project_manager:
             audio_loop.project_manager.log_chat("User", text)
             
         # Use the same 'send' method that worked for audio, as 'send_realtime_input' and 'send_client_content' seem unstable in this env
         # INJECT VIDEO FRAME IF AVAILABLE (VAD-style logic for Text Input)
-        if audio_loop and audio_loop._latest_image_payload:
-            print(f"[SERVER DEBUG] Piggybacking video frame with text input.")
+        frame = audio_loop._latest_image_payload
+        if frame:
+            logger.debug("[SERVER DEBUG] Piggybacking video frame with text input.")
             try:
                 # Send frame first
-                await audio_loop.session.send(input=audio_loop._latest_image_payload, end_of_turn=False)
+                await session.send(input=frame, end_of_turn=False)
             except Exception as e:
-                print(f"[SERVER DEBUG] Failed to send piggyback frame: {e}")
+                logger.warning("[SERVER DEBUG] Failed to send piggyback frame: %s", e)
                 
-        await audio_loop.session.send(input=text, end_of_turn=True)
-        print(f"[SERVER DEBUG] Message sent to model successfully.")
-
-import json
-from datetime import datetime
-from pathlib import Path
-
-# ... (imports)
+        await session.send(input=text, end_of_turn=True)
+        logger.debug("[SERVER DEBUG] Message sent to model successfully.")
 
 @sio.event
 async def video_frame(sid, data):
-    # data should contain 'image' which is binary (blob) or base64 encoded
+    # data should contain 'image': the client sends the JPEG as an ArrayBuffer, which arrives here as raw bytes
     image_data = data.get('image')
-    if image_data and audio_loop:
-        # We don't await this because we don't want to block the socket handler
-        # But send_frame is async, so we create a task
-        asyncio.create_task(audio_loop.send_frame(image_data))
+    if image_data and state.audio_loop:
+        # Awaited inline rather than spawned as a task: send_frame only swaps in the latest
+        # frame (never suspends), so a newer frame simply replaces one not yet sent
+        await state.audio_loop.send_frame(image_data)
+
+MEMORY_DIR = Path("long_term_memory")
+
+def write_memory_file(filename, messages):
+    # Format the whole transcript up front and hand it to a single write
+    payload = ''.join(f"{msg.get('sender', 'Unknown')}: {msg.get('text', '')}\n\n" for msg in messages).encode('utf-8')
+    # Raw fd: one encode and one write, without the TextIOWrapper/BufferedWriter layers
+    fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+    try:
+        view = memoryview(payload)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
 
 @sio.event
 async def save_memory(sid, data):
     try:
         messages = data.get('messages', [])
         if not messages:
-            print("No messages to save.")
+            logger.info("No messages to save.")
             return
 
-        # Ensure directory exists
-        memory_dir = Path("long_term_memory")
-        memory_dir.mkdir(exist_ok=True)
-
         # Generate filename
         # Use provided filename if available, else timestamp
         provided_name = data.get('filename')
@@ -510,59 +616,82 @@ async def save_memory(sid, data):
             if not provided_name.endswith('.txt'):
                 provided_name += '.txt'
             # Prevent directory traversal
-            filename = memory_dir / Path(provided_name).name 
+            filename = MEMORY_DIR / Path(provided_name).name 
         else:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = memory_dir / f"memory_{timestamp}.txt"
-
-        # Write to file
-        with open(filename, 'w', encoding='utf-8') as f:
-            for msg in messages:
-                sender = msg.get('sender', 'Unknown')
-                text = msg.get('text', '')
-        print(f"Conversation saved to {filename}")
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
+            filename = MEMORY_DIR / f"memory_{timestamp}.txt"
+
+        # Write to file (off the event loop so audio/video handlers aren't stalled by disk I/O)
+        await asyncio.get_running_loop().run_in_executor(memory_io, write_memory_file, filename, messages)
+        logger.info(f"Conversation saved to {filename}")
         await sio.emit('status', {'msg': 'Memory Saved Successfully'})
 
     except Exception as e:
-        print(f"Error saving memory: {e}")
+        logger.error(f"Error saving memory: {e}")
         await sio.emit('error', {'msg': f"Failed to save memory: {str(e)}"})
 
+MEMORY_CONTEXT_PREFIX = (
+    "System Notification: The user has uploaded a long-term memory file. "
+    "Please load the following context into your understanding. "
+    "The format is a text log of previous conversations:\n\n"
+)
+
 @sio.event
 async def upload_memory(sid, data):
-    print(f"Received memory upload request")
+    logger.info(f"Received memory upload request")
     try:
         memory_text = data.get('memory', '')
         if not memory_text:
-            print("No memory data provided.")
+            logger.info("No memory data provided.")
             return
 
+        audio_loop = state.audio_loop
         if not audio_loop:
-             print("[SERVER DEBUG] [Error] Audio loop is None. Cannot load memory.")
+             logger.error("[SERVER DEBUG] [Error] Audio loop is None. Cannot load memory.")
              await sio.emit('error', {'msg': "System not ready (Audio Loop inactive)"})
              return
         
-        if not audio_loop.session:
-             print("[SERVER DEBUG] [Error] Session is None. Cannot load memory.")
+        session = audio_loop.session
+        if not session:
+             logger.error("[SERVER DEBUG] [Error] Session is None. Cannot load memory.")
              await sio.emit('error', {'msg': "System not ready (No active session)"})
              return
 
         # Send to model
-        print("Sending memory context to model...")
-        context_msg = f"System Notification: The user has uploaded a long-term memory file. Please load the following context into your understanding. The format is a text log of previous conversations:\n\n{memory_text}"
+        logger.info("Sending memory context to model...")
+        context_msg = MEMORY_CONTEXT_PREFIX + memory_text
         
-        await audio_loop.session.send(input=context_msg, end_of_turn=True)
-        print("Memory context sent successfully.")
+        await session.send(input=context_msg, end_of_turn=True)
+        logger.info("Memory context sent successfully.")
         await sio.emit('status', {'msg': 'Memory Loaded into Context'})
 
     except Exception as e:
-        print(f"Error uploading memory: {e}")
+        logger.error(f"Error uploading memory: {e}")
         await sio.emit('error', {'msg': f"Failed to upload memory: {str(e)}"})
 
+# A discovery scan is a 5 s UDP broadcast. Clients asking within the TTL get the cached
+# device list, and clients asking while a scan is running share that scan.
+KASA_DISCOVERY_TTL = 30
+
+def on_kasa_discovery_done(task):
+    state.kasa_discovery_task = None
+    if not task.cancelled() and task.exception() is None:
+        state.kasa_discovered_at = time.monotonic()
+
+async def discover_kasa_devices():
+    if state.kasa_discovery_task is None:
+        if time.monotonic() - state.kasa_discovered_at < KASA_DISCOVERY_TTL:
+            return kasa_agent.get_devices_list()
+        state.kasa_discovery_task = asyncio.create_task(kasa_agent.discover_devices())
+        state.kasa_discovery_task.add_done_callback(on_kasa_discovery_done)
+    # Shielded so one client disconnecting mid-scan doesn't cancel it for the others
+    return await asyncio.shield(state.kasa_discovery_task)
+
 @sio.event
 async def discover_kasa(sid):
-    print(f"Received discover_kasa request")
+    logger.info(f"Received discover_kasa request")
     try:
-        devices = await kasa_agent.discover_devices()
+        devices = await discover_kasa_devices()
         await sio.emit('kasa_devices', devices)
         await sio.emit('status', {'msg': f"Found {len(devices)} Kasa devices"})
         
@@ -573,7 +702,8 @@ async def discover_kasa(sid):
             saved_devices.append({
                 "ip": d["ip"],
                 "alias": d["alias"],
-                "model": d["model"]
+                "model": d["model"],
+                "type": d["type"]
             })
         
         # Merge with existing to preserve any manual overrides? 
@@ -582,19 +712,19 @@ async def discover_kasa(sid):
         # A simple full persistence of current state is safest.
         SETTINGS["kasa_devices"] = saved_devices
         save_settings()
-        print(f"[SERVER] Saved {len(saved_devices)} Kasa devices to settings.")
+        logger.info(f"[SERVER] Saved {len(saved_devices)} Kasa devices to settings.")
         
     except Exception as e:
-        print(f"Error discovering kasa: {e}")
+        logger.error(f"Error discovering kasa: {e}")
         await sio.emit('error', {'msg': f"Kasa Discovery Failed: {str(e)}"})
 
 @sio.event
 async def iterate_cad(sid, data):
     # data: { prompt: "make it bigger" }
     prompt = data.get('prompt')
-    print(f"Received iterate_cad request: '{prompt}'")
+    logger.info(f"Received iterate_cad request: '{prompt}'")
     
-    if not audio_loop or not audio_loop.cad_agent:
+    if not state.audio_loop or not state.audio_loop.cad_agent:
         await sio.emit('error', {'msg': "CAD Agent not available"})
         return
 
@@ -604,34 +734,34 @@ async def iterate_cad(sid, data):
         await sio.emit('cad_status', {'status': 'generating'})
         
         # Call the agent with project path
-        cad_output_dir = str(audio_loop.project_manager.get_current_project_path() / "cad")
-        result = await audio_loop.cad_agent.iterate_prototype(prompt, output_dir=cad_output_dir)
+        cad_output_dir = str(state.audio_loop.project_manager.get_current_project_path() / "cad")
+        result = await state.audio_loop.cad_agent.iterate_prototype(prompt, output_dir=cad_output_dir)
         
         if result:
             info = f"{len(result.get('data', ''))} bytes (STL)"
-            print(f"Sending updated CAD data: {info}")
+            logger.info(f"Sending updated CAD data: {info}")
             await sio.emit('cad_data', result)
             # Save to Project
             if 'file_path' in result:
-                saved_path = audio_loop.project_manager.save_cad_artifact(result['file_path'], prompt)
+                saved_path = state.audio_loop.project_manager.save_cad_artifact(result['file_path'], prompt)
                 if saved_path:
-                    print(f"[SERVER] Saved iterated CAD to {saved_path}")
+                    logger.info(f"[SERVER] Saved iterated CAD to {saved_path}")
 
             await sio.emit('status', {'msg': 'Design updated'})
         else:
             await sio.emit('error', {'msg': 'Failed to update design'})
             
     except Exception as e:
-        print(f"Error iterating CAD: {e}")
+        logger.error(f"Error iterating CAD: {e}")
         await sio.emit('error', {'msg': f"Iteration Error: {str(e)}"})
 
 @sio.event
 async def generate_cad(sid, data):
     # data: { prompt: "make a cube" }
     prompt = data.get('prompt')
-    print(f"Received generate_cad request: '{prompt}'")
+    logger.info(f"Received generate_cad request: '{prompt}'")
     
-    if not audio_loop or not audio_loop.cad_agent:
+    if not state.audio_loop or not state.audio_loop.cad_agent:
         await sio.emit('error', {'msg': "CAD Agent not available"})
         return
 
@@ -640,36 +770,36 @@ async def generate_cad(sid, data):
         await sio.emit('cad_status', {'status': 'generating'})
         
         # Use generate_prototype based on prompt with project path
-        cad_output_dir = str(audio_loop.project_manager.get_current_project_path() / "cad")
-        result = await audio_loop.cad_agent.generate_prototype(prompt, output_dir=cad_output_dir)
+        cad_output_dir = str(state.audio_loop.project_manager.get_current_project_path() / "cad")
+        result = await state.audio_loop.cad_agent.generate_prototype(prompt, output_dir=cad_output_dir)
         
         if result:
             info = f"{len(result.get('data', ''))} bytes (STL)"
-            print(f"Sending newly generated CAD data: {info}")
+            logger.info(f"Sending newly generated CAD data: {info}")
             await sio.emit('cad_data', result)
 
 
             # Save to Project
             if 'file_path' in result:
-                saved_path = audio_loop.project_manager.save_cad_artifact(result['file_path'], prompt)
+                saved_path = state.audio_loop.project_manager.save_cad_artifact(result['file_path'], prompt)
                 if saved_path:
-                    print(f"[SERVER] Saved generated CAD to {saved_path}")
+                    logger.info(f"[SERVER] Saved generated CAD to {saved_path}")
 
             await sio.emit('status', {'msg': 'Design generated'})
         else:
             await sio.emit('error', {'msg': 'Failed to generate design'})
             
     except Exception as e:
-        print(f"Error generating CAD: {e}")
+        logger.error(f"Error generating CAD: {e}")
         await sio.emit('error', {'msg': f"Generation Error: {str(e)}"})
 
 @sio.event
 async def prompt_web_agent(sid, data):
     # data: { prompt: "find xyz" }
     prompt = data.get('prompt')
-    print(f"Received web agent prompt: '{prompt}'")
+    logger.info(f"Received web agent prompt: '{prompt}'")
     
-    if not audio_loop or not audio_loop.web_agent:
+    if not state.audio_loop or not state.audio_loop.web_agent:
         await sio.emit('error', {'msg': "Web Agent not available"})
         return
 
@@ -686,20 +816,20 @@ async def prompt_web_agent(sid, data):
         # But we want to catch errors here.
         
         # Based on typical agent design, run() is the entry point.
-        await audio_loop.web_agent.run(prompt)
+        await state.audio_loop.web_agent.run(prompt)
         
         await sio.emit('status', {'msg': 'Web Agent finished'})
         
     except Exception as e:
-        print(f"Error running Web Agent: {e}")
+        logger.error(f"Error running Web Agent: {e}")
         await sio.emit('error', {'msg': f"Web Agent Error: {str(e)}"})
 
 @sio.event
 async def discover_printers(sid):
-    print("Received discover_printers request")
+    logger.info("Received discover_printers request")
     
     # If audio_loop isn't ready yet, return saved printers from settings
-    if not audio_loop or not audio_loop.printer_agent:
+    if not state.audio_loop or not state.audio_loop.printer_agent:
         saved_printers = SETTINGS.get("printers", [])
         if saved_printers:
             # Convert saved printers to the expected format
@@ -712,7 +842,7 @@ async def discover_printers(sid):
                     "printer_type": p.get("type", "unknown"),
                     "camera_url": p.get("camera_url")
                 })
-            print(f"[SERVER] Returning {len(printer_list)} saved printers (audio_loop not ready)")
+            logger.info(f"[SERVER] Returning {len(printer_list)} saved printers (audio_loop not ready)")
             await sio.emit('printer_list', printer_list)
             return
         else:
@@ -721,11 +851,11 @@ async def discover_printers(sid):
             return
         
     try:
-        printers = await audio_loop.printer_agent.discover_printers()
+        printers = await state.audio_loop.printer_agent.discover_printers()
         await sio.emit('printer_list', printers)
         await sio.emit('status', {'msg': f"Found {len(printers)} printers"})
     except Exception as e:
-        print(f"Error discovering printers: {e}")
+        logger.error(f"Error discovering printers: {e}")
         await sio.emit('error', {'msg': f"Printer Discovery Failed: {str(e)}"})
 
 @sio.event
@@ -743,16 +873,16 @@ async def add_printer(sid, data):
         host = raw_host
         port = 80
     
-    print(f"Received add_printer request: {host}:{port} ({ptype})")
+    logger.info(f"Received add_printer request: {host}:{port} ({ptype})")
     
-    if not audio_loop or not audio_loop.printer_agent:
+    if not state.audio_loop or not state.audio_loop.printer_agent:
         await sio.emit('error', {'msg': "Printer Agent not available"})
         return
         
     try:
         # Add manually
         camera_url = data.get('camera_url')
-        printer = audio_loop.printer_agent.add_printer_manually(name, host, port=port, printer_type=ptype, camera_url=camera_url)
+        printer = state.audio_loop.printer_agent.add_printer_manually(name, host, port=port, printer_type=ptype, camera_url=camera_url)
         
         # Save to settings
         new_printer_config = {
@@ -775,16 +905,16 @@ async def add_printer(sid, data):
                 SETTINGS["printers"] = []
             SETTINGS["printers"].append(new_printer_config)
             save_settings()
-            print(f"[SERVER] Saved printer {name} to settings.")
+            logger.info(f"[SERVER] Saved printer {name} to settings.")
         
         # Probe to confirm/correct type
-        print(f"Probing {host} to confirm type...")
+        logger.info(f"Probing {host} to confirm type...")
         # Try port 7125 (Moonraker) and 4408 (Fluidd/K1) 
         ports_to_try = [80, 7125, 4408]
         
         actual_type = "unknown"
         for port in ports_to_try:
-             found_type = await audio_loop.printer_agent._probe_printer_type(host, port)
+             found_type = await state.audio_loop.printer_agent._probe_printer_type(host, port)
              if found_type.value != "unknown":
                  actual_type = found_type
                  # Update port if different
@@ -794,23 +924,23 @@ async def add_printer(sid, data):
         
         if actual_type != "unknown" and actual_type != printer.printer_type:
              printer.printer_type = actual_type
-             print(f"Corrected type to {actual_type.value} on port {printer.port}")
+             logger.info(f"Corrected type to {actual_type.value} on port {printer.port}")
              
         # Refresh list for everyone
-        printers = [p.to_dict() for p in audio_loop.printer_agent.printers.values()]
+        printers = [p.to_dict() for p in state.audio_loop.printer_agent.printers.values()]
         await sio.emit('printer_list', printers)
         await sio.emit('status', {'msg': f"Added printer: {name}"})
         
     except Exception as e:
-        print(f"Error adding printer: {e}")
+        logger.error(f"Error adding printer: {e}")
         await sio.emit('error', {'msg': f"Failed to add printer: {str(e)}"})
 
 @sio.event
 async def print_stl(sid, data):
-    print(f"Received print_stl request: {data}")
+    logger.info(f"Received print_stl request: {data}")
     # data: { stl_path: "path/to.stl" | "current", printer: "name_or_ip", profile: "optional" }
     
-    if not audio_loop or not audio_loop.printer_agent:
+    if not state.audio_loop or not state.audio_loop.printer_agent:
         await sio.emit('error', {'msg': "Printer Agent not available"})
         return
         
@@ -827,12 +957,12 @@ async def print_stl(sid, data):
         
         # Get current project path for resolution
         current_project_path = None
-        if audio_loop and audio_loop.project_manager:
-            current_project_path = str(audio_loop.project_manager.get_current_project_path())
-            print(f"[SERVER DEBUG] Using project path: {current_project_path}")
+        if state.audio_loop and state.audio_loop.project_manager:
+            current_project_path = str(state.audio_loop.project_manager.get_current_project_path())
+            logger.debug(f"[SERVER DEBUG] Using project path: {current_project_path}")
 
         # Resolve STL path before slicing so we can preview it
-        resolved_stl = audio_loop.printer_agent._resolve_file_path(stl_path, current_project_path)
+        resolved_stl = state.audio_loop.printer_agent._resolve_file_path(stl_path, current_project_path)
         
         if resolved_stl and os.path.exists(resolved_stl):
             # Open the STL in the CAD module for preview
@@ -843,14 +973,14 @@ async def print_stl(sid, data):
                 stl_b64 = base64.b64encode(stl_data).decode('utf-8')
                 stl_filename = os.path.basename(resolved_stl)
                 
-                print(f"[SERVER] Opening STL in CAD module: {stl_filename}")
+                logger.info(f"[SERVER] Opening STL in CAD module: {stl_filename}")
                 await sio.emit('cad_data', {
                     'format': 'stl',
                     'data': stl_b64,
                     'filename': stl_filename
                 })
             except Exception as e:
-                print(f"[SERVER] Warning: Could not preview STL: {e}")
+                logger.warning(f"[SERVER] Warning: Could not preview STL: {e}")
         
         # Progress Callback
         async def on_slicing_progress(percent, message):
@@ -862,7 +992,7 @@ async def print_stl(sid, data):
             if percent < 100:
                  await sio.emit('status', {'msg': f"Slicing: {percent}%"})
 
-        result = await audio_loop.printer_agent.print_stl(
+        result = await state.audio_loop.printer_agent.print_stl(
             stl_path, 
             printer_name, 
             profile,
@@ -874,22 +1004,22 @@ async def print_stl(sid, data):
         await sio.emit('status', {'msg': f"Print Job: {result.get('status', 'unknown')}"})
         
     except Exception as e:
-        print(f"Error printing STL: {e}")
+        logger.error(f"Error printing STL: {e}")
         await sio.emit('error', {'msg': f"Print Failed: {str(e)}"})
 
 @sio.event
 async def get_slicer_profiles(sid):
     """Get available OrcaSlicer profiles for manual selection."""
-    print("Received get_slicer_profiles request")
-    if not audio_loop or not audio_loop.printer_agent:
+    logger.info("Received get_slicer_profiles request")
+    if not state.audio_loop or not state.audio_loop.printer_agent:
         await sio.emit('error', {'msg': "Printer Agent not available"})
         return
     
     try:
-        profiles = audio_loop.printer_agent.get_available_profiles()
+        profiles = state.audio_loop.printer_agent.get_available_profiles()
         await sio.emit('slicer_profiles', profiles)
     except Exception as e:
-        print(f"Error getting slicer profiles: {e}")
+        logger.error(f"Error getting slicer profiles: {e}")
         await sio.emit('error', {'msg': f"Failed to get profiles: {str(e)}"})
 
 @sio.event
@@ -897,7 +1027,7 @@ async def control_kasa(sid, data):
     # data: { ip, action: "on"|"off"|"brightness"|"color", value: ... }
     ip = data.get('ip')
     action = data.get('action')
-    print(f"Kasa Control: {ip} -> {action}")
+    logger.info(f"Kasa Control: {ip} -> {action}")
     
     try:
         success = False
@@ -926,7 +1056,7 @@ async def control_kasa(sid, data):
              await sio.emit('error', {'msg': f"Failed to control device {ip}"})
 
     except Exception as e:
-         print(f"Error controlling kasa: {e}")
+         logger.error(f"Error controlling kasa: {e}")
          await sio.emit('error', {'msg': f"Kasa Control Error: {str(e)}"})
 
 @sio.event
@@ -936,13 +1066,13 @@ async def get_settings(sid):
 @sio.event
 async def update_settings(sid, data):
     # Generic update
-    print(f"Updating settings: {data}")
+    logger.info(f"Updating settings: {data}")
     
     # Handle specific keys if needed
     if "tool_permissions" in data:
         SETTINGS["tool_permissions"].update(data["tool_permissions"])
-        if audio_loop:
-            audio_loop.update_permissions(SETTINGS["tool_permissions"])
+        if state.audio_loop:
+            state.audio_loop.update_permissions(SETTINGS["tool_permissions"])
             
     if "face_auth_enabled" in data:
         SETTINGS["face_auth_enabled"] = data["face_auth_enabled"]
@@ -950,12 +1080,12 @@ async def update_settings(sid, data):
         if not data["face_auth_enabled"]:
              await sio.emit('auth_status', {'authenticated': True})
              # Stop auth loop if running?
-             if authenticator:
-                 authenticator.stop() 
+             if state.authenticator:
+                 state.authenticator.stop() 
 
     if "camera_flipped" in data:
         SETTINGS["camera_flipped"] = data["camera_flipped"]
-        print(f"[SERVER] Camera flip set to: {data['camera_flipped']}")
+        logger.info(f"[SERVER] Camera flip set to: {data['camera_flipped']}")
 
     save_settings()
     # Broadcast new full settings
@@ -969,21 +1099,49 @@ async def get_tool_permissions(sid):
 
 @sio.event
 async def update_tool_permissions(sid, data):
-    print(f"Updating permissions (legacy event): {data}")
+    logger.info(f"Updating permissions (legacy event): {data}")
     SETTINGS["tool_permissions"].update(data)
     save_settings()
     
-    if audio_loop:
-        audio_loop.update_permissions(SETTINGS["tool_permissions"])
+    if state.audio_loop:
+        state.audio_loop.update_permissions(SETTINGS["tool_permissions"])
     # Broadcast update to all
     await sio.emit('tool_permissions', SETTINGS["tool_permissions"])
 
 if __name__ == "__main__":
+    # uvloop (libuv) where available; Windows has no uvloop and keeps the Proactor policy set above
+    loop_impl = "asyncio"
+    if sys.platform != 'win32':
+        try:
+            import uvloop  # noqa: F401
+            loop_impl = "uvloop"
+        except ImportError:
+            logger.warning("[SERVER] uvloop not installed, using the default asyncio loop.")
+
+    # C HTTP parser when available (pure-Python h11 otherwise)
+    http_impl = "h11"
+    try:
+        import httptools  # noqa: F401
+        http_impl = "httptools"
+    except ImportError:
+        logger.warning("[SERVER] httptools not installed, using the h11 HTTP parser.")
+
+    # websockets implementation when available; otherwise let uvicorn pick (wsproto)
+    ws_impl = "auto"
+    try:
+        import websockets  # noqa: F401
+        ws_impl = "websockets"
+    except ImportError:
+        logger.warning("[SERVER] websockets not installed, letting uvicorn choose the WebSocket implementation.")
+
     uvicorn.run(
-        "server:app_socketio", 
+        app_socketio, # Pass the app itself: an import string would load this module a second time
         host="127.0.0.1", 
         port=8000, 
         reload=False, # Reload enabled causes spawn of worker which might miss the event loop policy patch
-        loop="asyncio",
+        loop=loop_impl,
+        http=http_impl,
+        ws=ws_impl,
+        access_log=False, # Per-request access lines are noise next to the Socket.IO traffic
         reload_excludes=["temp_cad_gen.py", "output.stl", "*.stl"]
     )
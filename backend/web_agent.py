@@ -1,5 +1,4 @@
 import os
-import time
 import asyncio
 import base64
 from dotenv import load_dotenv
@@ -19,6 +18,34 @@ SCREEN_WIDTH = 1440
 SCREEN_HEIGHT = 900
 # UPDATED: Use the specific Computer Use preview model
 MODEL_ID = "gemini-2.5-computer-use-preview-10-2025"
+HOME_URL = "https://www.google.com"
+SETTLE_SECONDS = 1
+
+# Model key names (lower-cased) -> Playwright key names
+_KEY_MAP = {
+    "ctrl": "Control", "control": "Control",
+    "cmd": "Meta", "command": "Meta", "meta": "Meta", "super": "Meta", "win": "Meta",
+    "alt": "Alt", "option": "Alt",
+    "shift": "Shift",
+    "enter": "Enter", "return": "Enter",
+    "esc": "Escape", "escape": "Escape",
+    "tab": "Tab", "space": "Space",
+    "backspace": "Backspace", "delete": "Delete", "del": "Delete", "insert": "Insert",
+    "up": "ArrowUp", "down": "ArrowDown", "left": "ArrowLeft", "right": "ArrowRight",
+    "arrowup": "ArrowUp", "arrowdown": "ArrowDown", "arrowleft": "ArrowLeft", "arrowright": "ArrowRight",
+    "pageup": "PageUp", "pagedown": "PageDown", "home": "Home", "end": "End",
+}
+_KEY_MAP.update({f"f{i}": f"F{i}" for i in range(1, 13)})
+
+# Built once at import; the nested Tool/Schema models are validated a single time
+WEB_AGENT_CONFIG = types.GenerateContentConfig(
+    tools=[types.Tool(
+        computer_use=types.ComputerUse(
+            environment=types.Environment.ENVIRONMENT_BROWSER
+        )
+    )],
+    thinking_config=types.ThinkingConfig(include_thoughts=True)
+)
 
 class WebAgent:
     def __init__(self):
@@ -26,132 +53,169 @@ class WebAgent:
         self.browser = None
         self.context = None
         self.page = None
+        self._fresh_url = None # URL of the last clean load, cleared once any action touches the page
 
     def denormalize_x(self, x: int, width: int) -> int:
-        return int((x / 1000) * width)
+        return int(x) * width // 1000
 
     def denormalize_y(self, y: int, height: int) -> int:
-        return int((y / 1000) * height)
-
-    async def execute_function_calls(self, function_calls):
-        results = []
-        
-        for call in function_calls:
-            # Extract ID if available, otherwise it might be None or empty depending on the SDK version
-            # But the Computer Use model typically expects IDs to be threaded back.
-            call_id = getattr(call, 'id', None)
-            fn_name = call.name
-            args = call.args
-            print(f"[ACTION] Action: {fn_name} {args}")
-
-            # --- SAFETY CHECK ---
-            requires_acknowledgement = False
-            if "safety_decision" in args:
-                 decision = args["safety_decision"]
-                 if decision.get("decision") == "require_confirmation":
-                     print(f"   [SAFETY] Safety Alert: {decision.get('explanation')}")
-                     print("   -> Auto-acknowledging to proceed.")
-                     requires_acknowledgement = True
-
-            result_data = {}
-            
-            try:
-                # --- NAVIGATION ---
-                if fn_name == "open_web_browser":
-                    pass 
-                elif fn_name == "navigate":
-                    await self.page.goto(args["url"])
-                elif fn_name == "go_back":
-                    await self.page.go_back()
-                elif fn_name == "go_forward":
-                    await self.page.go_forward()
-                elif fn_name == "search":
-                    await self.page.goto("https://www.google.com")
-                elif fn_name == "wait_5_seconds":
-                    await asyncio.sleep(5)
-
-                # --- MOUSE CLICKS & TYPING ---
-                elif fn_name == "click_at":
-                    x = self.denormalize_x(args["x"], SCREEN_WIDTH)
-                    y = self.denormalize_y(args["y"], SCREEN_HEIGHT)
-                    await self.page.mouse.click(x, y)
-                    
-                elif fn_name == "type_text_at":
-                    x = self.denormalize_x(args["x"], SCREEN_WIDTH)
-                    y = self.denormalize_y(args["y"], SCREEN_HEIGHT)
-                    text = args["text"]
-                    press_enter = args.get("press_enter", False)
-                    clear_before = args.get("clear_before_typing", True)
-                    
-                    await self.page.mouse.click(x, y)
-                    if clear_before:
-                        # 'Meta+A' for Mac, 'Control+A' for Windows/Linux
-                        # Simply using Control+A is usually fine for headless linux/windows envs
-                        await self.page.keyboard.press("Control+A") 
-                        await self.page.keyboard.press("Backspace")
-                    
-                    await self.page.keyboard.type(text)
-                    if press_enter:
-                        await self.page.keyboard.press("Enter")
-
-                # --- MOUSE MOVEMENT / HOVER ---
-                elif fn_name == "hover_at":
+        return int(y) * height // 1000
+
+    @staticmethod
+    def normalize_keys(key_comb: str) -> str:
+        """Maps a model key combination like 'ctrl+a' onto Playwright names ('Control+a')."""
+        return "+".join(_KEY_MAP.get(k.strip().lower(), k.strip()) for k in key_comb.split("+"))
+
+    async def _goto(self, url):
+        response = await self.page.goto(url)
+        # Remember a clean load so an immediate repeat visit can be skipped (see _go_home)
+        self._fresh_url = url if response is None or response.ok else None
+
+    async def _go_home(self):
+        # 'search' straight after startup targets the page we're already showing; skip the
+        # reload only if that page loaded cleanly and nothing has touched it since
+        if self._fresh_url == HOME_URL and self.page.url.rstrip("/") == HOME_URL.rstrip("/"):
+            return
+        await self._goto(HOME_URL)
+
+    async def execute_function_call(self, call):
+        # Extract ID if available, otherwise it might be None or empty depending on the SDK version
+        # But the Computer Use model typically expects IDs to be threaded back.
+        call_id = getattr(call, 'id', None)
+        fn_name = call.name
+        args = call.args
+        print(f"[ACTION] Action: {fn_name} {args}")
+
+        # --- SAFETY CHECK ---
+        requires_acknowledgement = False
+        if "safety_decision" in args:
+             decision = args["safety_decision"]
+             if decision.get("decision") == "require_confirmation":
+                 print(f"   [SAFETY] Safety Alert: {decision.get('explanation')}")
+                 print("   -> Auto-acknowledging to proceed.")
+                 requires_acknowledgement = True
+
+        result_data = {}
+        if fn_name not in ("navigate", "search", "open_web_browser", "wait_5_seconds"):
+            self._fresh_url = None
+
+        try:
+            # --- NAVIGATION ---
+            if fn_name == "open_web_browser":
+                pass 
+            elif fn_name == "navigate":
+                await self._goto(args["url"])
+            elif fn_name == "go_back":
+                await self.page.go_back()
+            elif fn_name == "go_forward":
+                await self.page.go_forward()
+            elif fn_name == "search":
+                await self._go_home()
+            elif fn_name == "wait_5_seconds":
+                await asyncio.sleep(5)
+
+            # --- MOUSE CLICKS & TYPING ---
+            elif fn_name == "click_at":
+                x = self.denormalize_x(args["x"], SCREEN_WIDTH)
+                y = self.denormalize_y(args["y"], SCREEN_HEIGHT)
+                await self.page.mouse.click(x, y)
+                
+            elif fn_name == "type_text_at":
+                x = self.denormalize_x(args["x"], SCREEN_WIDTH)
+                y = self.denormalize_y(args["y"], SCREEN_HEIGHT)
+                text = args["text"]
+                press_enter = args.get("press_enter", False)
+                clear_before = args.get("clear_before_typing", True)
+                
+                await self.page.mouse.click(x, y)
+                if clear_before:
+                    # 'Meta+A' for Mac, 'Control+A' for Windows/Linux
+                    # Simply using Control+A is usually fine for headless linux/windows envs
+                    await self.page.keyboard.press("Control+A") 
+                    await self.page.keyboard.press("Backspace")
+                
+                await self.page.keyboard.type(text)
+                if press_enter:
+                    await self.page.keyboard.press("Enter")
+
+            # --- MOUSE MOVEMENT / HOVER ---
+            elif fn_name == "hover_at":
+                x = self.denormalize_x(args["x"], SCREEN_WIDTH)
+                y = self.denormalize_y(args["y"], SCREEN_HEIGHT)
+                await self.page.mouse.move(x, y)
+
+            elif fn_name == "drag_and_drop":
+                start_x = self.denormalize_x(args["x"], SCREEN_WIDTH)
+                start_y = self.denormalize_y(args["y"], SCREEN_HEIGHT)
+                end_x = self.denormalize_x(args["destination_x"], SCREEN_WIDTH)
+                end_y = self.denormalize_y(args["destination_y"], SCREEN_HEIGHT)
+                
+                await self.page.mouse.move(start_x, start_y)
+                await self.page.mouse.down()
+                await self.page.mouse.move(end_x, end_y)
+                await self.page.mouse.up()
+
+            # --- KEYBOARD ---
+            elif fn_name == "key_combination":
+                key_comb = self.normalize_keys(args.get("keys", ""))
+                await self.page.keyboard.press(key_comb)
+
+            # --- SCROLLING ---
+            elif fn_name == "scroll_document" or fn_name == "scroll_at":
+                magnitude = args.get("magnitude", 800)
+                direction = args.get("direction", "down")
+                
+                # If scroll_at, move mouse there first
+                if fn_name == "scroll_at":
                     x = self.denormalize_x(args["x"], SCREEN_WIDTH)
                     y = self.denormalize_y(args["y"], SCREEN_HEIGHT)
                     await self.page.mouse.move(x, y)
 
-                elif fn_name == "drag_and_drop":
-                    start_x = self.denormalize_x(args["x"], SCREEN_WIDTH)
-                    start_y = self.denormalize_y(args["y"], SCREEN_HEIGHT)
-                    end_x = self.denormalize_x(args["destination_x"], SCREEN_WIDTH)
-                    end_y = self.denormalize_y(args["destination_y"], SCREEN_HEIGHT)
-                    
-                    await self.page.mouse.move(start_x, start_y)
-                    await self.page.mouse.down()
-                    await self.page.mouse.move(end_x, end_y)
-                    await self.page.mouse.up()
-
-                # --- KEYBOARD ---
-                elif fn_name == "key_combination":
-                    key_comb = args.get("keys")
-                    await self.page.keyboard.press(key_comb)
-
-                # --- SCROLLING ---
-                elif fn_name == "scroll_document" or fn_name == "scroll_at":
-                    magnitude = args.get("magnitude", 800)
-                    direction = args.get("direction", "down")
-                    
-                    # If scroll_at, move mouse there first
-                    if fn_name == "scroll_at":
-                        x = self.denormalize_x(args["x"], SCREEN_WIDTH)
-                        y = self.denormalize_y(args["y"], SCREEN_HEIGHT)
-                        await self.page.mouse.move(x, y)
-
-                    dx, dy = 0, 0
-                    if direction == "down": dy = magnitude
-                    elif direction == "up": dy = -magnitude
-                    elif direction == "right": dx = magnitude
-                    elif direction == "left": dx = -magnitude
-                    
-                    await self.page.mouse.wheel(dx, dy)
-
-                else:
-                    print(f"[WARN] Warning: Model requested unimplemented function {fn_name}")
-
-                # Wait a moment for UI to settle
-                await asyncio.sleep(1)
+                dx, dy = 0, 0
+                if direction == "down": dy = magnitude
+                elif direction == "up": dy = -magnitude
+                elif direction == "right": dx = magnitude
+                elif direction == "left": dx = -magnitude
                 
-            except Exception as e:
-                print(f"[ERR] Error executing {fn_name}: {e}")
-                result_data = {"error": str(e)}
+                await self.page.mouse.wheel(dx, dy)
 
-            # Add the acknowledgement flag if needed
-            if requires_acknowledgement:
-                result_data["safety_acknowledgement"] = True
+            else:
+                print(f"[WARN] Warning: Model requested unimplemented function {fn_name}")
 
-            results.append((call_id, fn_name, result_data))
-        
-        return results
+        except Exception as e:
+            print(f"[ERR] Error executing {fn_name}: {e}")
+            result_data = {"error": str(e)}
+
+        # Add the acknowledgement flag if needed
+        if requires_acknowledgement:
+            result_data["safety_acknowledgement"] = True
+
+        return call_id, fn_name, result_data
+
+    async def _execute_after(self, previous, call):
+        # Chain actions so ones started mid-stream still run in model order
+        if previous is not None:
+            await previous
+        return await self.execute_function_call(call)
+
+    @staticmethod
+    def strip_stale_screenshots(contents):
+        """
+        Drops screenshots from every user turn except the newest one.
+        The model only acts on the latest screen; older images would otherwise
+        be re-uploaded with every request for the rest of the task.
+        """
+        for content in contents[:-1]:
+            if content.role != "user":
+                continue
+            parts = []
+            for part in content.parts:
+                if part.inline_data:
+                    continue
+                if part.function_response and part.function_response.parts:
+                    part.function_response.parts = None
+                parts.append(part)
+            content.parts = parts
 
     async def get_function_responses(self, results):
         # UPDATED: Changed "jpeg" to "png" to satisfy Computer Use model requirements
@@ -203,16 +267,7 @@ class WebAgent:
             self.page = await self.context.new_page()
             
             # Start at Google
-            await self.page.goto("https://www.google.com")
-
-            config = types.GenerateContentConfig(
-                tools=[types.Tool(
-                    computer_use=types.ComputerUse(
-                        environment=types.Environment.ENVIRONMENT_BROWSER
-                    )
-                )],
-                thinking_config=types.ThinkingConfig(include_thoughts=True) 
-            )
+            await self._goto(HOME_URL)
 
             # UPDATED: Capture initial screenshot as PNG
             initial_screenshot = await self.page.screenshot(type="png")
@@ -238,62 +293,62 @@ class WebAgent:
             for turn in range(MAX_TURNS):
                 print(f"\n--- Turn {turn + 1} ---")
                 
+                thought_text = ""
+                agent_text = ""
+                model_parts = []
+                function_calls = []
+                actions = []
+                action = None
+
                 try:
-                    response = await self.client.aio.models.generate_content(
+                    # Stream so actions can start while the model is still decoding
+                    stream = await self.client.aio.models.generate_content_stream(
                         model=MODEL_ID,
                         contents=chat_history,
-                        config=config
+                        config=WEB_AGENT_CONFIG
                     )
+                    async for chunk in stream:
+                        if not (chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts):
+                            continue
+                        for part in chunk.candidates[0].content.parts:
+                            model_parts.append(part)
+                            if part.thought:
+                                thought_text += part.text or ""
+                            elif part.text:
+                                agent_text += part.text
+                            if part.function_call:
+                                function_calls.append(part.function_call)
+                                action = asyncio.create_task(self._execute_after(action, part.function_call))
+                                actions.append(action)
                 except Exception as e:
+                    for pending in actions:
+                        pending.cancel()
                     print(f"[CRITICAL] Critical API Error: {e}")
                     if update_callback: await update_callback(None, f"Error: {e}")
                     break
                 
                 # Check for empty response
-                if not response.candidates:
+                if not model_parts:
                     print("[WARN] Model returned no content.")
                     break
-                
-                candidate = response.candidates[0]
-                model_content = candidate.content
-                chat_history.append(model_content)
+                chat_history.append(types.Content(role="model", parts=model_parts))
 
-                # Process thoughts and tool calls
-                has_tool_use = False
-                thought_text = ""
-                agent_text = ""
-                
-                for part in model_content.parts:
-                    if part.thought:
-                        print(f"[THOUGHT] Thought: {part.text}")
-                        thought_text += f"[Thoughts] {part.text}\n"
-                    elif part.text:
-                        print(f"[AGENT] Agent: {part.text}")
-                        thought_text += f"[Agent] {part.text}\n"
-                        agent_text = part.text
-                    if part.function_call:
-                        has_tool_use = True
-                
+                if thought_text:
+                    print(f"[THOUGHT] Thought: {thought_text}")
                 if agent_text:
+                    print(f"[AGENT] Agent: {agent_text}")
                     final_response = agent_text
 
-                if update_callback and thought_text:
-                     # Send thoughts without image update yet
-                     pass # await update_callback(None, thought_text)
-
-                function_calls = [part.function_call for part in model_content.parts if part.function_call]
-                
                 if not function_calls:
-                    if not has_tool_use:
-                        print("[DONE] Task finished details.")
-                        if update_callback: await update_callback(None, "Task Finished")
-                        break
-                    else:
-                        print("...Thinking...")
-                        continue
-
-                # Execute Actions
-                results = await self.execute_function_calls(function_calls)
+                    print("[DONE] Task finished details.")
+                    if update_callback: await update_callback(None, "Task Finished")
+                    break
+
+                # Finish any actions still running, then let the UI settle once for the whole batch
+                results = list(await asyncio.gather(*actions))
+                if len(results) > 1:
+                    print(f"[ACTION] Executed {len(results)} actions")
+                await asyncio.sleep(SETTLE_SECONDS)
                 
                 # Capture new state
                 print("[SNAP] Capturing new state...")
@@ -309,6 +364,7 @@ class WebAgent:
                 # Send Response Back
                 response_parts = [types.Part(function_response=fr) for fr in function_responses]
                 chat_history.append(types.Content(role="user", parts=response_parts))
+                self.strip_stale_screenshots(chat_history)
 
             await self.browser.close()
             print("[CLOSE] Browser closed.")
@@ -1,5 +1,6 @@
 import React, { useEffect, useState, useRef } from 'react';
 import io from 'socket.io-client';
+import msgpackParser from 'socket.io-msgpack-parser';
 
 import Visualizer from './components/Visualizer';
 import TopAudioBar from './components/TopAudioBar';
@@ -18,7 +19,8 @@ import SettingsWindow from './components/SettingsWindow';
 
 
 
-const socket = io('http://localhost:8000');
+// Go straight to WebSocket; the backend is local so the long-polling handshake only adds latency
+const socket = io('http://localhost:8000', { transports: ['websocket'], parser: msgpackParser });
 const { ipcRenderer } = window.require('electron');
 
 function App() {
@@ -336,7 +338,8 @@ function App() {
             }
         });
         socket.on('audio_data', (data) => {
-            setAiAudioData(data.data);
+            // PCM arrives as a binary attachment (ArrayBuffer); view it as 0-255 byte values
+            setAiAudioData(new Uint8Array(data.data));
         });
         socket.on('auth_status', (data) => {
             console.log("Auth Status:", data);
@@ -470,6 +473,11 @@ function App() {
             setConfirmationRequest(data);
         });
 
+        // The backend gave up on a request (timed out or session stopped)
+        socket.on('tool_confirmation_dismissed', (data) => {
+            setConfirmationRequest(prev => (prev && prev.id === data.id ? null : prev));
+        });
+
         // Handle Print Window Request (from CadWindow)
         socket.on('request_print_window', () => {
             setShowPrinterWindow(true);
@@ -628,6 +636,7 @@ function App() {
             socket.off('browser_frame');
             socket.off('transcription');
             socket.off('tool_confirmation_request');
+            socket.off('tool_confirmation_dismissed');
             socket.off('kasa_devices');
             socket.off('printer_list');
             socket.off('slicing_progress');
@@ -791,7 +800,8 @@ function App() {
                     // Convert resized image to blob
                     transCanvas.toBlob((blob) => {
                         if (blob) {
-                            socket.emit('video_frame', { image: blob });
+                            // msgpack encodes ArrayBuffers, not Blobs
+                            blob.arrayBuffer().then((buf) => socket.emit('video_frame', { image: buf }));
                         }
                     }, 'image/jpeg', 0.6); // Slightly higher compression for speed
                 }
@@ -168,6 +168,20 @@ class TestReferenceImage:
             print("Reference image loaded")
         else:
             print("No reference image found (expected in new setup)")
+    
+    def test_reference_landmark_cache(self, tmp_path):
+        """Test reference landmarks are reused from the on-disk cache."""
+        ref_path = tmp_path / "reference.jpg"
+        ref_path.write_bytes(b"placeholder")
+        auth = FaceAuthenticator(reference_image_path=str(ref_path))
+        
+        landmarks = np.random.rand(1404).astype(np.float32)
+        np.savez(auth._reference_cache_path(), landmarks=landmarks, key=np.array(auth._reference_cache_key()))
+        
+        auth.reference_landmarks = None
+        auth._load_reference()
+        assert np.array_equal(auth.reference_landmarks, landmarks)
+        assert auth._compare_landmarks(auth.reference_landmarks, landmarks)
 
 
 class TestCameraAccess:
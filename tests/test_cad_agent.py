@@ -130,3 +130,87 @@ class TestBuild123dImport:
             print(f"build123d version: {build123d.__version__}")
         except ImportError:
             pytest.skip("build123d not installed")
+
+
+class TestCadCodeCache:
+    """Test the per-prompt LRU of scripts that produced an STL."""
+
+    @pytest.fixture
+    def agent(self, monkeypatch):
+        import cad_agent
+        # Never boot the real worker process; _run_script is faked per test
+        monkeypatch.setattr(cad_agent._worker, "start", lambda: None)
+        return CadAgent()
+
+    def test_cache_is_bounded_and_evicts_oldest(self, agent):
+        from cad_agent import CODE_CACHE_SIZE
+        for i in range(CODE_CACHE_SIZE + 2):
+            agent._cache_code(f"prompt {i}", f"code {i}")
+
+        assert len(agent._code_cache) == CODE_CACHE_SIZE
+        assert "prompt 0" not in agent._code_cache
+        assert "prompt 1" not in agent._code_cache
+        assert list(agent._code_cache)[-1] == f"prompt {CODE_CACHE_SIZE + 1}"
+
+    def test_recaching_refreshes_recency(self, agent):
+        from cad_agent import CODE_CACHE_SIZE
+        for i in range(CODE_CACHE_SIZE):
+            agent._cache_code(f"prompt {i}", f"code {i}")
+
+        agent._cache_code("prompt 0", "code 0 v2")
+        agent._cache_code("new prompt", "new code")
+
+        assert agent._code_cache["prompt 0"] == "code 0 v2"
+        assert "prompt 1" not in agent._code_cache
+
+    @pytest.mark.asyncio
+    async def test_success_is_cached_and_reused(self, agent, tmp_path):
+        requests = []
+        runs = []
+
+        async def request_code(contents):
+            requests.append(contents)
+            return "export_stl(part, 'output.stl')"
+
+        async def run_script(script_path, output_path):
+            runs.append(script_path)
+            return None, "U1RM"
+
+        agent._request_code = request_code
+        agent._run_script = run_script
+
+        first = await agent.generate_prototype("a cube", output_dir=str(tmp_path))
+        second = await agent.generate_prototype("a cube", output_dir=str(tmp_path))
+
+        assert first["data"] == second["data"] == "U1RM"
+        assert len(requests) == 1  # second call reused the cached script
+        assert len(runs) == 2  # but still ran it for a fresh STL
+        assert "a cube" in agent._code_cache
+
+    @pytest.mark.asyncio
+    async def test_cache_hit_moves_prompt_to_end(self, agent, tmp_path):
+        agent._cache_code("a cube", "code")
+        agent._cache_code("a sphere", "code")
+
+        async def run_script(script_path, output_path):
+            return None, "U1RM"
+
+        agent._run_script = run_script
+        await agent.generate_prototype("a cube", output_dir=str(tmp_path))
+
+        assert list(agent._code_cache) == ["a sphere", "a cube"]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("result", [("Traceback: boom", None), (None, None)])
+    async def test_failures_are_not_cached(self, agent, tmp_path, result):
+        async def request_code(contents):
+            return "broken script"
+
+        async def run_script(script_path, output_path):
+            return result
+
+        agent._request_code = request_code
+        agent._run_script = run_script
+
+        assert await agent.generate_prototype("a cube", output_dir=str(tmp_path)) is None
+        assert "a cube" not in agent._code_cache
@@ -0,0 +1,186 @@
+"""
+Tests for the AudioLoop send path and playback queue helpers.
+"""
+import pytest
+import asyncio
+from types import SimpleNamespace
+
+# Try to import jarvis, skip all tests if dependencies missing
+try:
+    from jarvis import AudioLoop, ClearableQueue, SEND_BATCH_MAX
+    HAS_JARVIS = True
+except ImportError as e:
+    HAS_JARVIS = False
+    IMPORT_ERROR = str(e)
+
+pytestmark = pytest.mark.skipif(not HAS_JARVIS, reason=f"JARVIS dependencies not installed: {IMPORT_ERROR if not HAS_JARVIS else ''}")
+
+
+def pcm(data):
+    return {"data": data, "mime_type": "audio/pcm"}
+
+
+def jpeg(data):
+    return {"data": data, "mime_type": "image/jpeg"}
+
+
+class TestCoalescePcm:
+    """Test merging of queued realtime messages."""
+
+    def test_adjacent_pcm_chunks_are_merged(self):
+        merged = AudioLoop._coalesce_pcm([pcm(b"ab"), pcm(b"cd"), pcm(b"ef")])
+        assert merged == [pcm(b"abcdef")]
+
+    def test_single_pcm_chunk_passes_through_uncopied(self):
+        chunk = pcm(b"ab")
+        merged = AudioLoop._coalesce_pcm([chunk])
+        assert merged == [chunk]
+        assert merged[0] is chunk
+
+    def test_non_audio_messages_keep_their_position(self):
+        frame = jpeg(b"img")
+        text = {"text": "hello"}
+        merged = AudioLoop._coalesce_pcm([pcm(b"a"), pcm(b"b"), frame, pcm(b"c"), text])
+        assert merged == [pcm(b"ab"), frame, pcm(b"c"), text]
+        assert merged[1] is frame
+        assert merged[3] is text
+
+    def test_empty_batch(self):
+        assert AudioLoop._coalesce_pcm([]) == []
+
+
+class TestSendRealtime:
+    """Test that send_realtime drains at most SEND_BATCH_MAX messages per wakeup."""
+
+    @pytest.mark.asyncio
+    async def test_batch_is_capped(self):
+        sent = []
+
+        async def send(input, end_of_turn):
+            sent.append(input)
+
+        loop = SimpleNamespace(
+            out_queue=asyncio.Queue(),
+            session=SimpleNamespace(send=send),
+            _coalesce_pcm=AudioLoop._coalesce_pcm,
+        )
+        # Alternate frames and audio so nothing merges and each send maps to one message
+        total = SEND_BATCH_MAX + 3
+        for i in range(total):
+            loop.out_queue.put_nowait(jpeg(bytes([i])) if i % 2 else pcm(bytes([i])))
+
+        task = asyncio.create_task(AudioLoop.send_realtime(loop))
+        try:
+            for _ in range(100):
+                if len(sent) == total:
+                    break
+                await asyncio.sleep(0)
+        finally:
+            task.cancel()
+
+        assert [m["data"] for m in sent] == [bytes([i]) for i in range(total)]
+
+    @pytest.mark.asyncio
+    async def test_pcm_beyond_cap_goes_in_next_batch(self):
+        sent = []
+
+        async def send(input, end_of_turn):
+            sent.append(input)
+
+        loop = SimpleNamespace(
+            out_queue=asyncio.Queue(),
+            session=SimpleNamespace(send=send),
+            _coalesce_pcm=AudioLoop._coalesce_pcm,
+        )
+        for i in range(SEND_BATCH_MAX + 1):
+            loop.out_queue.put_nowait(pcm(b"x"))
+
+        task = asyncio.create_task(AudioLoop.send_realtime(loop))
+        try:
+            for _ in range(100):
+                if len(sent) == 2:
+                    break
+                await asyncio.sleep(0)
+        finally:
+            task.cancel()
+
+        assert [m["data"] for m in sent] == [b"x" * SEND_BATCH_MAX, b"x"]
+
+
+class TestClearableQueue:
+    """Test ClearableQueue.clear() keeps asyncio.Queue's bookkeeping consistent."""
+
+    @pytest.mark.asyncio
+    async def test_clear_empties_queue(self):
+        q = ClearableQueue()
+        for i in range(5):
+            q.put_nowait(i)
+
+        assert q.clear() == 5
+        assert q.qsize() == 0
+        assert q.empty()
+        with pytest.raises(asyncio.QueueEmpty):
+            q.get_nowait()
+
+    @pytest.mark.asyncio
+    async def test_queue_usable_after_clear(self):
+        q = ClearableQueue()
+        q.put_nowait("old")
+        q.clear()
+        q.put_nowait("new")
+        assert q.qsize() == 1
+        assert q.get_nowait() == "new"
+
+    @pytest.mark.asyncio
+    async def test_join_returns_after_clear(self):
+        q = ClearableQueue()
+        for i in range(3):
+            q.put_nowait(i)
+
+        q.clear()
+        await asyncio.wait_for(q.join(), timeout=1)
+
+    @pytest.mark.asyncio
+    async def test_clear_keeps_task_done_accounting(self):
+        q = ClearableQueue()
+        q.put_nowait("a")
+        q.put_nowait("b")
+        q.put_nowait("c")
+
+        # One item is taken and still being worked on when the rest are dropped
+        assert q.get_nowait() == "a"
+        assert q.clear() == 2
+
+        join = asyncio.create_task(q.join())
+        await asyncio.sleep(0)
+        assert not join.done()
+
+        q.task_done()
+        await asyncio.wait_for(join, timeout=1)
+
+        # No phantom unfinished tasks are left behind
+        with pytest.raises(ValueError):
+            q.task_done()
+
+
+class TestToolConfirmationDismissal:
+    """Test that stop() withdraws confirmation popups nobody can answer any more."""
+
+    @pytest.mark.asyncio
+    async def test_stop_cancels_and_dismisses_pending(self):
+        dismissed = []
+        loop = SimpleNamespace(
+            stop_event=asyncio.Event(),
+            _pending_confirmations={},
+            on_tool_confirmation_dismissed=dismissed.append,
+        )
+        loop._dismiss_tool_confirmation = lambda request_id: AudioLoop._dismiss_tool_confirmation(loop, request_id)
+        futures = {7: asyncio.get_running_loop().create_future(), 8: asyncio.get_running_loop().create_future()}
+        loop._pending_confirmations.update(futures)
+
+        AudioLoop.stop(loop)
+
+        assert loop.stop_event.is_set()
+        assert sorted(dismissed) == [7, 8]
+        assert all(f.cancelled() for f in futures.values())
+        assert loop._pending_confirmations == {}
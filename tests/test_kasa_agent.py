@@ -185,3 +185,81 @@ class TestKasaColorConversion:
         agent = KasaAgent()
         hsv = agent.name_to_hsv("notacolor")
         assert hsv is None
+
+
+class FakePlug:
+    """Offline stand-in for a kasa plug: commands only take effect on the device side until update()."""
+
+    is_bulb = False
+    is_plug = True
+    is_strip = False
+    is_dimmer = False
+    is_color = False
+    is_dimmable = False
+
+    def __init__(self, host, alias, is_on=False):
+        self.host = host
+        self.alias = alias
+        self.model = "HS100"
+        self.is_on = is_on
+        self._device_on = is_on
+        self.updates = 0
+
+    async def turn_on(self):
+        self._device_on = True
+
+    async def turn_off(self):
+        self._device_on = False
+
+    async def update(self):
+        self.updates += 1
+        self.is_on = self._device_on
+
+
+class TestKasaStateOverlay:
+    """Test the locally remembered state layered over the last update()."""
+
+    @pytest.fixture
+    def agent(self):
+        agent = KasaAgent()
+        agent.devices["192.168.1.10"] = FakePlug("192.168.1.10", "Desk Lamp")
+        return agent
+
+    def _info(self, agent, ip="192.168.1.10"):
+        return next(d for d in agent.get_devices_list() if d["ip"] == ip)
+
+    @pytest.mark.asyncio
+    async def test_turn_on_reflected_in_devices_list(self, agent):
+        assert self._info(agent)["is_on"] is False
+        assert await agent.turn_on("192.168.1.10")
+        assert self._info(agent)["is_on"] is True
+        # Served from the overlay, not a refresh
+        assert agent.devices["192.168.1.10"].updates == 0
+
+    @pytest.mark.asyncio
+    async def test_turn_off_by_alias_reflected_in_devices_list(self, agent):
+        await agent.turn_on("Desk Lamp")
+        assert await agent.turn_off("desk lamp")
+        assert self._info(agent)["is_on"] is False
+
+    @pytest.mark.asyncio
+    async def test_refresh_clears_overlay(self, agent):
+        await agent.turn_on("192.168.1.10")
+        assert "192.168.1.10" in agent._last_state
+
+        # The device was switched off elsewhere; a refresh must win over what we remembered
+        agent.devices["192.168.1.10"]._device_on = False
+        assert await agent.refresh("192.168.1.10")
+
+        assert "192.168.1.10" not in agent._last_state
+        assert self._info(agent)["is_on"] is False
+
+    @pytest.mark.asyncio
+    async def test_failed_command_leaves_state_untouched(self, agent):
+        async def broken():
+            raise OSError("unreachable")
+
+        agent.devices["192.168.1.10"].turn_on = broken
+        assert await agent.turn_on("192.168.1.10") is False
+        assert "192.168.1.10" not in agent._last_state
+        assert self._info(agent)["is_on"] is False
@@ -0,0 +1,131 @@
+"""
+Tests for server-side helpers that don't need a running Socket.IO client.
+"""
+import pytest
+import asyncio
+import signal
+
+# server.py installs process-wide SIGINT/SIGTERM handlers on import; keep pytest's own
+_saved_handlers = {sig: signal.getsignal(sig) for sig in (signal.SIGINT, signal.SIGTERM)}
+
+# Try to import the server, skip all tests if dependencies missing
+try:
+    import server
+    HAS_SERVER = True
+except ImportError as e:
+    HAS_SERVER = False
+    IMPORT_ERROR = str(e)
+finally:
+    for sig, handler in _saved_handlers.items():
+        signal.signal(sig, handler)
+
+pytestmark = pytest.mark.skipif(not HAS_SERVER, reason=f"Server dependencies not installed: {IMPORT_ERROR if not HAS_SERVER else ''}")
+
+
+class FakeKasaAgent:
+    """Counts discovery scans; each scan blocks until the test releases it."""
+
+    def __init__(self):
+        self.scans = 0
+        self.release = asyncio.Event()
+        self.cached = [{"ip": "192.168.1.10", "alias": "Desk Lamp", "is_on": True}]
+
+    async def discover_devices(self):
+        self.scans += 1
+        await self.release.wait()
+        return list(self.cached)
+
+    def get_devices_list(self):
+        return list(self.cached)
+
+
+class TestKasaDiscoveryCache:
+    """Test the single-flight + TTL wrapper around KasaAgent.discover_devices."""
+
+    @pytest.fixture
+    def kasa(self, monkeypatch):
+        agent = FakeKasaAgent()
+        monkeypatch.setattr(server, "kasa_agent", agent)
+        monkeypatch.setattr(server.state, "kasa_discovery_task", None)
+        monkeypatch.setattr(server.state, "kasa_discovered_at", 0.0)
+        return agent
+
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_scan(self, kasa):
+        callers = [asyncio.create_task(server.discover_kasa_devices()) for _ in range(5)]
+        await asyncio.sleep(0)
+        kasa.release.set()
+        results = await asyncio.gather(*callers)
+
+        assert kasa.scans == 1
+        assert all(r == kasa.cached for r in results)
+
+    @pytest.mark.asyncio
+    async def test_call_within_ttl_uses_cache(self, kasa):
+        kasa.release.set()
+        await server.discover_kasa_devices()
+        await asyncio.sleep(0)  # let the done-callback record the scan time
+
+        assert await server.discover_kasa_devices() == kasa.cached
+        assert kasa.scans == 1
+
+    @pytest.mark.asyncio
+    async def test_call_after_ttl_scans_again(self, kasa):
+        kasa.release.set()
+        await server.discover_kasa_devices()
+        await asyncio.sleep(0)
+
+        # Age the last scan past the TTL
+        server.state.kasa_discovered_at -= server.KASA_DISCOVERY_TTL + 1
+        await server.discover_kasa_devices()
+        assert kasa.scans == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_scan_is_not_cached(self, kasa):
+        async def failing_scan():
+            kasa.scans += 1
+            raise OSError("network unreachable")
+
+        kasa.discover_devices = failing_scan
+        with pytest.raises(OSError):
+            await server.discover_kasa_devices()
+        await asyncio.sleep(0)
+
+        assert server.state.kasa_discovery_task is None
+        with pytest.raises(OSError):
+            await server.discover_kasa_devices()
+        assert kasa.scans == 2
+
+
+class TestWriteMemoryFile:
+    """Test the raw-fd memory transcript writer."""
+
+    def test_writes_full_transcript(self, tmp_path):
+        target = tmp_path / "memory.txt"
+        messages = [
+            {"sender": "User", "text": "Hello"},
+            {"sender": "JARVIS", "text": "Olá — how can I help?"},
+            {"text": "no sender"},
+        ]
+        server.write_memory_file(target, messages)
+
+        assert target.read_text(encoding="utf-8") == (
+            "User: Hello\n\n"
+            "JARVIS: Olá — how can I help?\n\n"
+            "Unknown: no sender\n\n"
+        )
+
+    def test_large_transcript_written_completely(self, tmp_path):
+        target = tmp_path / "memory.txt"
+        messages = [{"sender": "User", "text": "x" * 1000} for _ in range(2000)]
+        server.write_memory_file(target, messages)
+
+        assert target.stat().st_size == len(("User: " + "x" * 1000 + "\n\n").encode("utf-8")) * 2000
+
+    def test_existing_file_is_truncated(self, tmp_path):
+        target = tmp_path / "memory.txt"
+        target.write_text("stale content that is much longer than the new transcript\n" * 10)
+
+        server.write_memory_file(target, [{"sender": "User", "text": "Hi"}])
+
+        assert target.read_text(encoding="utf-8") == "User: Hi\n\n"
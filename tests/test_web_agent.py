@@ -47,6 +47,60 @@ class TestCoordinateDenormalization:
         assert isinstance(result, (int, float))
 
 
+class TestKeyNormalization:
+    """Test key combination mapping to Playwright key names."""
+    
+    def test_normalize_modifiers(self):
+        """Test common modifier aliases map to Playwright names."""
+        assert WebAgent.normalize_keys("ctrl+a") == "Control+a"
+        assert WebAgent.normalize_keys("Cmd+Shift+T") == "Meta+Shift+T"
+    
+    def test_normalize_named_keys(self):
+        """Test named keys and pass-through of already valid names."""
+        assert WebAgent.normalize_keys("enter") == "Enter"
+        assert WebAgent.normalize_keys("Escape") == "Escape"
+        assert WebAgent.normalize_keys("f5") == "F5"
+
+
+class TestScreenshotHistory:
+    """Test that only the latest screenshot is kept in the request history."""
+    
+    def test_strip_stale_screenshots(self):
+        """Test older screenshots are dropped and the newest is kept."""
+        from google.genai import types
+        
+        png = b"\x89PNG fake"
+        
+        def screenshot_response():
+            return types.FunctionResponse(
+                name="click_at",
+                response={"url": "https://example.com"},
+                parts=[types.FunctionResponsePart(
+                    inline_data=types.FunctionResponseBlob(mime_type="image/png", data=png)
+                )]
+            )
+        
+        old_fr = screenshot_response()
+        new_fr = screenshot_response()
+        contents = [
+            types.Content(role="user", parts=[
+                types.Part(text="goal"),
+                types.Part.from_bytes(data=png, mime_type="image/png")
+            ]),
+            types.Content(role="model", parts=[types.Part(text="clicking")]),
+            types.Content(role="user", parts=[types.Part(function_response=old_fr)]),
+            types.Content(role="model", parts=[types.Part(text="clicking again")]),
+            types.Content(role="user", parts=[types.Part(function_response=new_fr)]),
+        ]
+        
+        WebAgent.strip_stale_screenshots(contents)
+        
+        assert [p.text for p in contents[0].parts] == ["goal"]
+        assert old_fr.parts is None
+        assert old_fr.response == {"url": "https://example.com"}
+        assert new_fr.parts is not None
+
+
 class TestWebBrowserLaunch:
     """Test browser launching capabilities."""
     